@@ -0,0 +1,133 @@
+"""Measure Canister.all read throughput against a seeded MongoDB collection.
+
+    poetry run python benchmarks/bench_canister_all.py -p tests/pymongo.yml -e test -n 1000000
+
+Without a mongod, --client_only serves the same documents from pre-encoded
+BSON, which isolates the decoding and construction cost on the client.
+"""
+import argparse
+import time
+
+import bson
+from bson import ObjectId
+
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.pymongo_fixes import MongoClientConfigurator
+
+BENCHMARK_COLLECTION_NAME = 'canisters_benchmark'
+
+
+class BenchmarkCanister(Canister):
+    collection_name = BENCHMARK_COLLECTION_NAME
+
+
+def seed_documents(start, stop):
+    return [
+        {
+            'canister_id': f'{index:010d}-aaaaa-aaaaa-aaaaa-cai',
+            'controllers': [f'controller-{index % 5000:05d}', f'controller-{index % 17:05d}'],
+            'module_hash': f'{index % 2000:064x}',
+            'subnet_id': f'subnet-{index % 37:02d}',
+            'last_status_code': 200 if index % 3 else 500,
+            'is_web_canister': bool(index % 3),
+        }
+        for index in range(start, stop)
+    ]
+
+
+def seed(database, count, batch_size=10000):
+    collection = database[BENCHMARK_COLLECTION_NAME]
+
+    if collection.estimated_document_count() == count:
+        return
+
+    collection.drop()
+
+    for start in range(0, count, batch_size):
+        collection.insert_many(seed_documents(start, min(start + batch_size, count)))
+
+
+class EncodedCollection:
+    # Stands in for the server: projections are applied up front, and every
+    # read decodes BSON the way the driver does for each cursor batch.
+    def __init__(self, count, projections):
+        documents = [{'_id': ObjectId(), **document} for document in seed_documents(0, count)]
+
+        self.__encoded = {
+            self.key(projection): [bson.encode(self.project(document, projection)) for document in documents]
+            for projection in projections
+        }
+
+    @staticmethod
+    def key(projection):
+        return tuple(sorted((projection or {}).items()))
+
+    @staticmethod
+    def project(document, projection):
+        if not projection:
+            return document
+
+        fields = {field for field, included in projection.items() if included}
+        if projection.get('_id', 1):
+            fields.add('_id')
+
+        return {field: value for field, value in document.items() if field in fields}
+
+    def find(self, query_filter=None, projection=None, sort=None, batch_size=None):
+        return (bson.decode(document) for document in self.__encoded[self.key(projection)])
+
+
+def legacy_all():
+    # Canister.all as it was before projections and batch sizing.
+    finder = BenchmarkCanister.get_client()[BENCHMARK_COLLECTION_NAME].find(None)
+    while True:
+        try:
+            yield BenchmarkCanister(**next(finder))
+        except StopIteration:
+            break
+
+
+def measure(name, canisters):
+    start_time = time.perf_counter()
+    count = sum(1 for _ in canisters)
+    elapsed = time.perf_counter() - start_time
+
+    print(f'{name:<38} {count:>10} documents {elapsed:>8.2f}s {count / elapsed:>12,.0f}/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-p', '--pymongo_config', default='pymongo.yml')
+    parser.add_argument('-e', '--environment', default='development')
+    parser.add_argument('-n', '--count', type=int, default=1000000)
+    parser.add_argument('--client_only', action='store_true')
+    args = parser.parse_args()
+
+    if args.client_only:
+        database = {BENCHMARK_COLLECTION_NAME: EncodedCollection(
+            args.count,
+            [None, {'canister_id': 1}, {'_id': 0, 'canister_id': 1}]
+        )}
+    else:
+        database = MongoClientConfigurator(
+            config_path=args.pymongo_config,
+            environment=args.environment
+        ).from_config()
+
+        seed(database, args.count)
+
+    BenchmarkCanister.set_client(database)
+
+    measure('legacy finder.next()', legacy_all())
+    measure('all()', BenchmarkCanister.all())
+    measure('all(batch_size=10000)', BenchmarkCanister.all(batch_size=10000))
+    measure('all(projection=canister_id)', BenchmarkCanister.all(projection={'canister_id': 1}))
+    measure('all(raw=True)', BenchmarkCanister.all(raw=True))
+    measure(
+        'all(projection=canister_id, raw=True)',
+        BenchmarkCanister.all(projection={'_id': 0, 'canister_id': 1}, raw=True)
+    )
+
+
+if __name__ == '__main__':
+    main()
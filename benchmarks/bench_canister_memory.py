@@ -0,0 +1,103 @@
+"""Compare the memory footprint and construction speed of Canister with the
+dict-backed class it replaced.
+
+    poetry run python benchmarks/bench_canister_memory.py -n 200000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from internet_computer.tools.inventory import Canister
+
+
+class DictCanister:
+    # Canister as it was before slotted storage and string interning.
+    def __init__(
+        self,
+        _id=None,
+        canister_id=None,
+        controllers=None,
+        module_hash=None,
+        subnet_id=None,
+        last_status_code=None,
+        is_web_canister=None
+    ):
+        self.__id = _id
+        self.__canister_id = canister_id
+        self.__controllers = controllers
+        self.__module_hash = module_hash
+        self.__subnet_id = subnet_id
+        self.__last_status_code = last_status_code
+        self.__is_web_canister = is_web_canister
+
+
+def documents(count):
+    # Decoding BSON or JSON yields a fresh string per field, so every
+    # document gets its own copies, as it would coming off a cursor.
+    return [
+        {
+            'canister_id': f'{index:010d}-aaaaa-aaaaa-aaaaa-cai',
+            'controllers': [
+                ''.join(['controller-', f'{index % 5000:05d}']),
+                ''.join(['controller-', f'{index % 17:05d}']),
+            ],
+            'module_hash': f'{index % 2000:064x}',
+            'subnet_id': ''.join(['subnet-', f'{index % 37:02d}']),
+            'last_status_code': 200,
+            'is_web_canister': True,
+        }
+        for index in range(count)
+    ]
+
+
+def construction_time(canister_class, count):
+    raw_documents = documents(count)
+
+    start_time = time.perf_counter()
+    for document in raw_documents:
+        canister_class(**document)
+
+    return time.perf_counter() - start_time
+
+
+def retained_memory(canister_class, count):
+    gc.collect()
+    tracemalloc.start()
+
+    raw_documents = documents(count)
+    canisters = [canister_class(**document) for document in raw_documents]
+
+    # Dropping the source documents leaves only what the canisters retain.
+    del raw_documents
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del canisters
+
+    return retained
+
+
+def measure(canister_class, count):
+    elapsed = construction_time(canister_class, count)
+    retained = retained_memory(canister_class, count)
+
+    print(
+        f'{canister_class.__name__:<14} {count:>10} canisters '
+        f'{elapsed:>8.2f}s {count / elapsed:>12,.0f}/s '
+        f'{retained / count:>8.0f} bytes/canister'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--count', type=int, default=200000)
+    args = parser.parse_args()
+
+    measure(DictCanister, args.count)
+    measure(Canister, args.count)
+
+
+if __name__ == '__main__':
+    main()
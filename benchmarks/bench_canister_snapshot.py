@@ -0,0 +1,62 @@
+"""Measure snapshot compile time, file size, open time and point lookup latency.
+
+    poetry run python benchmarks/bench_canister_snapshot.py -n 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.snapshot import CanisterSnapshot, CanisterSnapshotWriter
+
+
+def canisters(count):
+    for index in range(count):
+        yield Canister(
+            canister_id=f'{index:010d}-aaaaa-aaaaa-aaaaa-cai',
+            controllers=[f'controller-{index % 5000:05d}', f'controller-{index % 17:05d}'],
+            module_hash=f'{index % 2000:064x}',
+            subnet_id=f'subnet-{index % 37:02d}',
+            last_status_code=200,
+            is_web_canister=True,
+            last_probed_at=1700000000.0
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--count', type=int, default=1000000)
+    parser.add_argument('-l', '--lookups', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'canisters.snapshot')
+
+        start_time = time.perf_counter()
+        with CanisterSnapshotWriter(path) as writer:
+            for canister in canisters(args.count):
+                writer.add(canister)
+        print(f'compile  {time.perf_counter() - start_time:>8.2f}s {os.path.getsize(path) / 2 ** 20:>8.1f} MiB')
+
+        start_time = time.perf_counter()
+        snapshot = CanisterSnapshot(path)
+        print(f'open     {(time.perf_counter() - start_time) * 1e6:>8.1f}us')
+
+        canister_ids = [f'{random.randrange(args.count):010d}-aaaaa-aaaaa-aaaaa-cai' for _ in range(args.lookups)]
+
+        start_time = time.perf_counter()
+        for canister_id in canister_ids:
+            snapshot.get(canister_id)
+        print(f'lookup   {(time.perf_counter() - start_time) / args.lookups * 1e6:>8.1f}us')
+
+        start_time = time.perf_counter()
+        matched = sum(1 for _ in snapshot.by_subnet('subnet-07'))
+        print(f'by_subnet {time.perf_counter() - start_time:>7.2f}s {matched} canisters')
+
+        snapshot.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import requests
+
+
+class CacheMissError(Exception):
+    def __init__(self, url):
+        super().__init__(f'{url} is not cached and the cache is offline.')
+        self.url = url
+
+
+class ResponseCache:
+    DEFAULT_TTL = 3600
+    DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+    # Eviction frees a little more than the overflow, so a full cache does
+    # not rescan its directory on every store.
+    eviction_ratio = 0.9
+
+    def __init__(self, directory, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE, offline=False):
+        self.__directory = Path(directory)
+        self.__ttl = ttl
+        self.__max_size = max_size
+        self.__offline = offline
+        self.__size = None
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    @property
+    def ttl(self):
+        return self.__ttl
+
+    @property
+    def max_size(self):
+        return self.__max_size
+
+    @property
+    def offline(self):
+        return self.__offline
+
+    def path_for(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self.directory / key[:2] / f'{key}.json'
+
+    def lookup(self, url):
+        path = self.path_for(url)
+
+        try:
+            with open(path, 'r') as stream:
+                entry = json.load(stream)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # The modification time orders entries for eviction, so reading one
+        # marks it as recently used.
+        os.utime(path)
+
+        return entry
+
+    def fresh(self, entry, now=None):
+        return (now if now is not None else time.time()) - entry['stored_at'] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+
+        if entry is None:
+            return headers
+
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        return headers
+
+    def __resolve(self, url):
+        entry = self.lookup(url)
+
+        # Offline, a stale entry is still better than no answer.
+        if entry is not None and (self.offline or self.fresh(entry)):
+            return entry, entry['body']
+
+        if self.offline:
+            raise CacheMissError(url)
+
+        return entry, None
+
+    def cached(self, url):
+        return self.__resolve(url)[1]
+
+    def get(self, url):
+        entry, body = self.__resolve(url)
+        if body is not None:
+            return 200, body
+
+        response = requests.get(url, headers=self.conditional_headers(entry))
+
+        return self.update(url, entry, response.status_code, response.headers, response.text)
+
+    async def get_async(self, session, url):
+        entry, body = self.__resolve(url)
+        if body is not None:
+            return 200, body
+
+        async with session.get(url, headers=self.conditional_headers(entry)) as resp:
+            return self.update(url, entry, resp.status, resp.headers, await resp.text())
+
+    def update(self, url, entry, status, headers, body):
+        if status == 304 and entry is not None:
+            entry['stored_at'] = time.time()
+            self.__write(url, entry)
+            return 200, entry['body']
+
+        if status == 200:
+            self.__write(url, {
+                'url': url,
+                'stored_at': time.time(),
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'body': body,
+            })
+
+        return status, body
+
+    def __write(self, url, entry):
+        path = self.path_for(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        size = self.size() - (path.stat().st_size if path.is_file() else 0)
+
+        temporary_path = path.with_name(path.name + '.tmp')
+        with open(temporary_path, 'w') as stream:
+            json.dump(entry, stream)
+
+        os.replace(temporary_path, path)
+
+        self.__size = size + path.stat().st_size
+
+        if self.__size > self.max_size:
+            self.evict()
+
+    def __entries(self):
+        if not self.directory.is_dir():
+            return []
+
+        return list(self.directory.glob('*/*.json'))
+
+    def size(self):
+        if self.__size is None:
+            self.__size = sum(path.stat().st_size for path in self.__entries())
+
+        return self.__size
+
+    def evict(self):
+        target_size = self.max_size * self.eviction_ratio
+
+        entries = []
+        for path in self.__entries():
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= target_size:
+                break
+
+            path.unlink(missing_ok=True)
+            size -= entry_size
+
+        self.__size = size
+
+    def clear(self):
+        for path in self.__entries():
+            path.unlink(missing_ok=True)
+
+        self.__size = 0
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from pymongo.database import Database
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileCheckpointStore:
+    def __init__(self, path):
+        self.__path = Path(path)
+
+    @property
+    def path(self):
+        return self.__path
+
+    def __read(self):
+        if not self.path.is_file():
+            return {}
+
+        with open(self.path, 'r') as stream:
+            return json.load(stream)
+
+    def load(self, name):
+        return self.__read().get(name)
+
+    @contextmanager
+    def __locked(self):
+        # web_status --processes checkpoints every process into one file, so
+        # the read-modify-write is serialised across processes.
+        if fcntl is None:
+            yield
+            return
+
+        with open(self.path.with_name(self.path.name + '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def save(self, name, state):
+        with self.__locked():
+            checkpoints = self.__read()
+            checkpoints[name] = state
+
+            # Write to a sibling file of this writer's own and swap it in, so
+            # a crash mid-write never leaves a truncated checkpoint behind.
+            temporary_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(temporary_path, 'w') as stream:
+                json.dump(checkpoints, stream)
+                stream.flush()
+                os.fsync(stream.fileno())
+
+            os.replace(temporary_path, self.path)
+
+
+class MongoCheckpointStore:
+    collection_name = 'checkpoints'
+
+    def __init__(self, client: Database):
+        self.__client = client
+
+    @property
+    def collection(self):
+        return self.__client[self.collection_name]
+
+    def load(self, name):
+        found = self.collection.find_one({'_id': name})
+
+        if found is None:
+            return None
+
+        return found['state']
+
+    def save(self, name, state):
+        self.collection.replace_one(
+            {'_id': name},
+            {'_id': name, 'state': state, 'updated_at': time.time()},
+            upsert=True
+        )
+
+
+class CrawlCheckpoint:
+    DEFAULT_INTERVAL = 30
+
+    mongo_location = 'mongo'
+
+    def __init__(self, store, name, interval=DEFAULT_INTERVAL):
+        self.__store = store
+        self.__name = name
+        self.__interval = interval
+        self.__last_saved = time.monotonic()
+
+    @property
+    def store(self):
+        return self.__store
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def interval(self):
+        return self.__interval
+
+    def load(self):
+        return self.store.load(self.name)
+
+    def save_due(self):
+        return time.monotonic() - self.__last_saved >= self.interval
+
+    def save(self, state):
+        self.__last_saved = time.monotonic()
+        self.store.save(self.name, state)
+
+    @classmethod
+    def from_location(cls, location, name, interval=DEFAULT_INTERVAL, database_factory=None):
+        if location == cls.mongo_location:
+            return cls(MongoCheckpointStore(database_factory()), name, interval)
+
+        return cls(FileCheckpointStore(location), name, interval)
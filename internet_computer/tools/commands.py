@@ -1,12 +1,31 @@
 import argparse
 import asyncio
+import multiprocessing
 import os
-import time
+import sys
+import threading
+from collections import deque
+from contextlib import ExitStack, aclosing, nullcontext, suppress
+from itertools import product
 from pathlib import Path
 
-import aiohttp
+from bson import ObjectId
 
+from internet_computer.tools.cache import ResponseCache
+from internet_computer.tools.checkpoint import CrawlCheckpoint
+from internet_computer.tools.diff import CanisterDiff
 from internet_computer.tools.inventory import Canister, CanisterDataFetcher
+from internet_computer.tools.membership import KnownCanisters
+from internet_computer.tools.parallel_dump import ParallelCanisterDump
+from internet_computer.tools.persistence import CanisterBulkWriter, ThreadedCanisterWriter
+from internet_computer.tools.pipeline import CanisterPipeline
+from internet_computer.tools.probe import CanisterProbe
+from internet_computer.tools.scheduler import CanisterProbeScheduler
+from internet_computer.tools.snapshot import CanisterSnapshot, CanisterSnapshotWriter
+from internet_computer.tools.stats import CanisterStatistics
+from internet_computer.tools.sync import CanisterDeltaSync
+from internet_computer.tools.throttle import EndpointThrottle
+from internet_computer.tools.writers import CanisterWriter
 from internet_computer.tools.pymongo_fixes import MongoClientConfigurator
 
 #
@@ -44,13 +63,51 @@ class MongoValidator:
 
 class CanisterWebStatusFetcher:
     DEFAULT_TASK_PROCESSOR_COUNT = 1024
+    DEFAULT_QUEUE_SIZE = 4096
+
+    # The probe only needs the canister id, and the writer upserts by it.
+    probe_projection = {'canister_id': 1}
+
+    # Textual principals begin with the base32 of their CRC32, so their
+    # leading characters are uniform and ranges of them split canisters
+    # evenly. Listed in string order, which is what the ranges compare by.
+    principal_alphabet = '234567abcdefghijklmnopqrstuvwxyz'
+    shard_prefixes = [''.join(prefix) for prefix in product(principal_alphabet, repeat=2)]
 
     command_name = 'web_status'
 
-    def __init__(self, total_task_processors=DEFAULT_TASK_PROCESSOR_COUNT):
-        self.__counter = 0
-        self.__queue = asyncio.Queue()
+    def __init__(
+        self,
+        total_task_processors=DEFAULT_TASK_PROCESSOR_COUNT,
+        batch_size=CanisterBulkWriter.DEFAULT_BATCH_SIZE,
+        flush_interval=CanisterBulkWriter.DEFAULT_FLUSH_INTERVAL,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        probe=None,
+        shard_index=0,
+        shard_count=1,
+        process_index=0,
+        processes=1,
+        scheduler=None
+    ):
+        self.check_shard(shard_index, shard_count, process_index, processes)
+
+        self.__scheduler = scheduler
+
+        self.__probe = probe if probe is not None else CanisterProbe()
+        self.__shard_index = shard_index
+        self.__shard_count = shard_count
+        self.__process_index = process_index
+        self.__processes = processes
+        self.__added = 0
+        self.__processed = 0
+        self.__queue = asyncio.Queue(maxsize=queue_size)
         self.__total_task_processors = total_task_processors
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+        self.__writer = None
+        self.__frontier = deque()
+        self.__resume_id = None
+        self.__stop_reading = threading.Event()
 
     @property
     def queue(self):
@@ -61,28 +118,159 @@ class CanisterWebStatusFetcher:
         return self.__total_task_processors
 
     @property
-    def counter(self):
-        return self.__counter
+    def writer(self):
+        return self.__writer
+
+    @property
+    def probe(self):
+        return self.__probe
+
+    @property
+    def scheduler(self):
+        return self.__scheduler
+
+    @property
+    def shard_index(self):
+        return self.__shard_index
+
+    @property
+    def shard_count(self):
+        return self.__shard_count
+
+    @property
+    def process_index(self):
+        return self.__process_index
+
+    @property
+    def processes(self):
+        return self.__processes
+
+    @classmethod
+    def check_shard(cls, shard_index, shard_count, process_index=0, processes=1):
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f'Shard index {shard_index} is outside of {shard_count} shards.')
+
+        if not 0 <= process_index < processes:
+            raise ValueError(f'Process index {process_index} is outside of {processes} processes.')
+
+        if processes > len(cls.shard_prefixes) // shard_count:
+            raise ValueError(
+                f'{shard_count} shards of {processes} processes exceed {len(cls.shard_prefixes)} canister ranges.'
+            )
 
-    @counter.setter
-    def counter(self, value):
-        self.__counter = value
+    @classmethod
+    def shard_range(cls, shard_index, shard_count, process_index=0, processes=1):
+        # Hosts split the prefixes first and each host splits its own range
+        # between its processes, so hosts may run different process counts.
+        count = len(cls.shard_prefixes)
+        shard_start = shard_index * count // shard_count
+        shard_size = (shard_index + 1) * count // shard_count - shard_start
+
+        start = shard_start + process_index * shard_size // processes
+        stop = shard_start + (process_index + 1) * shard_size // processes
+
+        # The outer ranges are open, so ids outside the alphabet still land
+        # in exactly one of them.
+        lower = cls.shard_prefixes[start] if start > 0 else None
+        upper = cls.shard_prefixes[stop] if stop < count else None
+
+        return lower, upper
+
+    @property
+    def shard_filter(self):
+        lower, upper = self.shard_range(self.shard_index, self.shard_count, self.process_index, self.processes)
+
+        key_range = {}
+        if lower is not None:
+            key_range['$gte'] = lower
+        if upper is not None:
+            key_range['$lt'] = upper
+
+        return {'canister_id': key_range} if key_range else {}
+
+    @property
+    def counter(self):
+        return self.__added - self.__processed
 
     async def __worker(self):
-        async with aiohttp.ClientSession() as session:
-            while True:
-                canister = await self.queue.get()
-                await canister.verify_web_canister_async(session)
-                canister.save()
+        while True:
+            canister = await self.queue.get()
+
+            # Queue order is cursor order, so the frontier stays sorted by _id.
+            progress = [canister._id, False]
+            self.__frontier.append(progress)
+
+            try:
+                await canister.verify_web_canister_async(self.probe)
+                await self.writer.put_async(canister)
+            except CanisterProbe.failures:
+                # Unreachable canisters stay unverified and are retried on
+                # the next run.
+                pass
+            finally:
+                progress[1] = True
+                self.__advance_frontier()
 
-                self.counter -= 1
+                self.__processed += 1
 
-                if self.counter % 1000 == 0:
-                    print(f'Processed {self.counter}. Queue size: {self.queue.qsize()}')
+                if self.__processed % 1000 == 0:
+                    print(f'Processed {self.__processed}. Queue size: {self.queue.qsize()}')
 
                 self.queue.task_done()
 
-    async def populate(self, pymongo_config_path, environment):
+    def __advance_frontier(self):
+        while self.__frontier and self.__frontier[0][1]:
+            self.__resume_id = self.__frontier.popleft()[0]
+
+    async def __save_checkpoint(self, checkpoint):
+        resume_id = self.__resume_id
+
+        if resume_id is None:
+            return
+
+        loop = asyncio.get_running_loop()
+
+        # Probe results up to the resume id must be durable before the
+        # checkpoint claims them.
+        await loop.run_in_executor(None, self.writer.flush)
+        await loop.run_in_executor(None, checkpoint.save, {'last_id': str(resume_id)})
+
+    async def __checkpoint_periodically(self, checkpoint):
+        while True:
+            await asyncio.sleep(checkpoint.interval)
+            await self.__save_checkpoint(checkpoint)
+
+    def pending(self, query_filter):
+        # The shard is part of the query, so each process only reads its own
+        # canisters off the canister_id range.
+        if self.scheduler is None:
+            yield from Canister.all({**query_filter, **self.shard_filter}, self.probe_projection, sort=[('_id', 1)])
+            return
+
+        for _, tier_filter, sort in self.scheduler.tiers():
+            yield from Canister.all({**tier_filter, **self.shard_filter}, self.probe_projection, sort=sort)
+
+    def __read_pending(self, loop, query_filter):
+        # Runs on an executor thread: the cursor pages without blocking the
+        # event loop, and the bounded queue applies backpressure to it.
+        for canister in self.pending(query_filter):
+            if self.__stop_reading.is_set():
+                return
+
+            self.__added += 1
+            if self.__added % 1000 == 0:
+                print(f'Added {self.__added} canisters to process. Queue size: {self.queue.qsize()}')
+
+            asyncio.run_coroutine_threadsafe(self.queue.put(canister), loop).result()
+
+    async def populate(
+        self,
+        pymongo_config_path,
+        environment,
+        checkpoint_location=None,
+        checkpoint_interval=CrawlCheckpoint.DEFAULT_INTERVAL,
+        resume=False
+    ):
         mongo_client = MongoClientConfigurator(
             config_path=pymongo_config_path,
             environment=environment
@@ -90,24 +278,146 @@ class CanisterWebStatusFetcher:
 
         Canister.set_client(mongo_client)
 
+        checkpoint = None
+        query_filter = {'last_status_code': None}
+
+        if checkpoint_location and self.scheduler is not None:
+            raise ValueError('Checkpoints only apply to runs over unverified canisters.')
+
+        if checkpoint_location:
+            name = self.command_name
+            if self.shard_count > 1:
+                name = f'{name}:{self.shard_index}/{self.shard_count}'
+            if self.processes > 1:
+                name = f'{name}:{self.process_index}/{self.processes}'
+
+            checkpoint = CrawlCheckpoint.from_location(
+                checkpoint_location,
+                name=name,
+                interval=checkpoint_interval,
+                database_factory=lambda: mongo_client
+            )
+
+            state = checkpoint.load() if resume else None
+            if state is not None:
+                query_filter['_id'] = {'$gt': ObjectId(state['last_id'])}
+
+        # Persistence runs on a dedicated thread so that Mongo round trips
+        # never stall the in-flight probes.
+        self.__writer = ThreadedCanisterWriter(
+            batch_size=self.__batch_size,
+            flush_interval=self.__flush_interval
+        )
+
         tasks = []
         for i in range(self.total_task_processors):
             task = asyncio.create_task(self.__worker())
             tasks.append(task)
 
-        for canister in Canister.all({'last_status_code': None}):
-            self.counter += 1
-            if self.counter % 1000 == 0:
-                print(f'Added {self.counter} canisters to process. Queue size: {self.queue.qsize()}')
-            await self.queue.put(canister)
+        if checkpoint is not None:
+            tasks.append(asyncio.create_task(self.__checkpoint_periodically(checkpoint)))
+
+        loop = asyncio.get_running_loop()
+
+        reader = loop.run_in_executor(None, self.__read_pending, loop, query_filter)
+        drained = asyncio.create_task(self.__drain(reader))
+
+        try:
+            # Workers only finish by failing, so whichever completes first
+            # either drained the queue or carries the error to raise.
+            done, _ = await asyncio.wait([drained, *tasks], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        except BaseException:
+            await self.__stop(reader, drained, tasks)
 
+            with suppress(Exception):
+                await loop.run_in_executor(None, self.writer.close)
+
+            raise
+
+        await self.__stop(reader, drained, tasks)
+
+        if checkpoint is not None:
+            await self.__save_checkpoint(checkpoint)
+
+        await loop.run_in_executor(None, self.writer.close)
+
+    async def __drain(self, reader):
+        await asyncio.shield(reader)
         await self.queue.join()
 
-        # Cancel our worker tasks.
-        for task in tasks:
+    async def __stop(self, reader, drained, tasks):
+        # Queued canisters are dropped, which unblocks a reader waiting for
+        # room; it then sees the stop and returns.
+        self.__stop_reading.set()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+
+        for task in [drained, *tasks]:
             task.cancel()
-        # Wait until all worker tasks are cancelled.
-        await asyncio.gather(*tasks, return_exceptions=True)
+
+        await asyncio.gather(reader, drained, *tasks, return_exceptions=True)
+
+        await self.probe.close()
+
+    @classmethod
+    def populate_shard(cls, fetcher_options, probe_options, populate_options):
+        fetcher = cls(probe=CanisterProbe(**probe_options), **fetcher_options)
+        asyncio.run(fetcher.populate(**populate_options))
+
+    @classmethod
+    def populate_in_processes(
+        cls,
+        processes,
+        fetcher_options,
+        probe_options,
+        populate_options,
+        shard_index=0,
+        shard_count=1
+    ):
+        cls.check_shard(shard_index, shard_count, processes=processes)
+
+        # Every process owns a disjoint slice of this host's shard, however
+        # many processes the other hosts run.
+        context = multiprocessing.get_context('spawn')
+
+        # The probe budget is for the whole host, so each process gets its share.
+        if probe_options.get('rate'):
+            probe_options = {
+                **probe_options,
+                'rate': probe_options['rate'] / processes,
+            }
+
+        workers = [
+            context.Process(
+                target=cls.populate_shard,
+                args=(
+                    {
+                        **fetcher_options,
+                        'shard_index': shard_index,
+                        'shard_count': shard_count,
+                        'process_index': process_index,
+                        'processes': processes,
+                    },
+                    probe_options,
+                    populate_options
+                ),
+                name=f'{cls.command_name}-{process_index}'
+            )
+            for process_index in range(processes)
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join()
+
+        failed = [worker.name for worker in workers if worker.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"{', '.join(failed)} exited with an error.")
 
 
 class CanisterFetcher:
@@ -116,7 +426,7 @@ class CanisterFetcher:
     def __init__(self):
         pass
 
-    def fetch(
+    async def fetch(
         self,
         pymongo_config_path,
         environment,
@@ -126,11 +436,35 @@ class CanisterFetcher:
         output,
         source_url,
         store_to_mongo,
-        verify_web_canister
+        verify_web_canister,
+        concurrency=CanisterDataFetcher.DEFAULT_CONCURRENCY,
+        ordered=True,
+        batch_size=CanisterBulkWriter.DEFAULT_BATCH_SIZE,
+        flush_interval=CanisterBulkWriter.DEFAULT_FLUSH_INTERVAL,
+        probe=None,
+        probe_concurrency=CanisterPipeline.DEFAULT_PROBE_CONCURRENCY,
+        queue_size=CanisterPipeline.DEFAULT_QUEUE_SIZE,
+        checkpoint_location=None,
+        checkpoint_interval=CrawlCheckpoint.DEFAULT_INTERVAL,
+        resume=False,
+        output_file=None,
+        compression=None,
+        api_throttle=None,
+        cache=None,
+        skip_unchanged=False
     ):
-        result_fetcher = CanisterDataFetcher(source_url).fetch()
+        if probe is None:
+            probe = CanisterProbe()
+
+        data_fetcher = CanisterDataFetcher(
+            source_url,
+            concurrency=concurrency,
+            ordered=ordered,
+            throttle=api_throttle,
+            cache=cache
+        )
 
-        if store_to_mongo:
+        def database():
             config_path = pymongo_config_path
             if not Path(config_path).is_file():
                 config_path = os.path.join(
@@ -138,61 +472,137 @@ class CanisterFetcher:
                     config_path
                 )
 
-            mongo_client = MongoClientConfigurator(
+            return MongoClientConfigurator(
                 config_path=config_path,
                 environment=environment
             ).from_config()
 
+        checkpoint = None
+
+        if checkpoint_location:
+            checkpoint = CrawlCheckpoint.from_location(
+                checkpoint_location,
+                name=f'{self.command_name}:{source_url}',
+                interval=checkpoint_interval,
+                database_factory=database
+            )
+
+            state = checkpoint.load() if resume else None
+            if state is not None:
+                data_fetcher.offset = state['offset']
+
+        writer = None
+        known = None
+
+        if store_to_mongo:
+            mongo_client = database()
             Canister.set_client(mongo_client)
 
-        start_time = time.time()
+            writer = ThreadedCanisterWriter(
+                batch_size=batch_size,
+                flush_interval=flush_interval
+            )
 
-        canister_count = 0
+            if skip_unchanged:
+                known = await asyncio.get_running_loop().run_in_executor(None, KnownCanisters.load, mongo_client)
 
-        output_comma = False
+        canister_writer = CanisterWriter.for_output(
+            output,
+            fields_to_output=fields_to_output,
+            output_file=output_file,
+            compression=compression
+        )
 
-        match output:
-            case 'csv':
-                print(Canister.csv_header(fields_to_output))
-            case 'json':
-                print(Canister.json_header())
-            case '':
-                pass
+        pipeline = CanisterPipeline(
+            data_fetcher,
+            emit=canister_writer.write if canister_writer is not None else None,
+            probe=probe if verify_web_canister else None,
+            writer=writer,
+            probe_concurrency=probe_concurrency,
+            queue_size=queue_size,
+            maximum_canister_count=maximum_canister_count,
+            maximum_time_limit=maximum_time_limit,
+            checkpoint=checkpoint,
+            known=known
+        )
 
-        for canister in result_fetcher:
-            canister_count += 1
+        # The output is closed even when the run fails, so whatever was
+        # emitted so far is flushed and the file stays well formed.
+        with canister_writer if canister_writer is not None else nullcontext():
+            try:
+                await pipeline.run()
+            finally:
+                await probe.close()
 
-            if canister is None or canister_count > maximum_canister_count:
-                break
+                if writer is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, writer.close)
 
-            if output_comma:
-                print(',')
+        if known is not None:
+            print(f'Skipped {pipeline.skipped_count} unchanged canisters of {len(known)} known.', file=sys.stderr)
 
-            if verify_web_canister:
-                canister.verify_web_canister()
 
-            if store_to_mongo:
-                canister.save()
+class CanisterSynchronizer:
+    command_name = 'sync_canisters'
 
-            match output:
-                case 'csv':
-                    print(canister.to_csv(fields_to_output))
-                case 'json':
-                    print(canister.to_json(fields_to_output), end='')
-                    output_comma = True
-                case '':
-                    pass
+    def __init__(self):
+        pass
 
-            if time.time() - start_time >= maximum_time_limit:
-                break
+    async def sync(
+        self,
+        pymongo_config_path,
+        environment,
+        source_url,
+        verify_web_canister,
+        concurrency=CanisterDataFetcher.DEFAULT_CONCURRENCY,
+        batch_size=CanisterBulkWriter.DEFAULT_BATCH_SIZE,
+        flush_interval=CanisterBulkWriter.DEFAULT_FLUSH_INTERVAL,
+        probe=None,
+        state_location=CrawlCheckpoint.mongo_location,
+        rescan=False,
+        api_throttle=None,
+        cache=None
+    ):
+        mongo_client = MongoClientConfigurator(
+            config_path=pymongo_config_path,
+            environment=environment
+        ).from_config()
 
-        match output:
-            case 'csv':
-                print('')
-            case 'json':
-                print(Canister.json_footer())
-            case '':
-                pass
+        Canister.set_client(mongo_client)
+
+        state = CrawlCheckpoint.from_location(
+            state_location,
+            name=f'{self.command_name}:{source_url}',
+            database_factory=lambda: mongo_client
+        )
+
+        writer = ThreadedCanisterWriter(
+            batch_size=batch_size,
+            flush_interval=flush_interval
+        )
+
+        if probe is None:
+            probe = CanisterProbe()
+
+        delta_sync = CanisterDeltaSync(
+            CanisterDataFetcher(source_url, concurrency=concurrency, throttle=api_throttle, cache=cache),
+            writer=writer,
+            state=state,
+            probe=probe if verify_web_canister else None,
+            rescan=rescan
+        )
+
+        try:
+            counts = await delta_sync.run()
+        finally:
+            await probe.close()
+            await asyncio.get_running_loop().run_in_executor(None, writer.close)
+
+        print(
+            f"Inserted {counts['inserted']}, updated {counts['updated']} "
+            f"and left {counts['unchanged']} canisters unchanged."
+        )
+
+        return counts
 
 
 class MongoDumper:
@@ -205,8 +615,38 @@ class MongoDumper:
         self,
         pymongo_config_path,
         environment,
-        output
+        output,
+        fields_to_output=None,
+        batch_size=Canister.DEFAULT_BATCH_SIZE,
+        output_file=None,
+        compression=None,
+        workers=1,
+        merge=False,
+        partition_key=ParallelCanisterDump.DEFAULT_PARTITION_KEY
     ):
+        if output and workers > 1:
+            return ParallelCanisterDump(
+                pymongo_config_path=pymongo_config_path,
+                environment=environment,
+                output=output,
+                output_file=output_file,
+                workers=workers,
+                fields_to_output=fields_to_output,
+                compression=compression,
+                batch_size=batch_size,
+                partition_key=partition_key
+            ).dump(merge=merge)
+
+        canister_writer = CanisterWriter.for_output(
+            output,
+            fields_to_output=fields_to_output,
+            output_file=output_file,
+            compression=compression
+        )
+
+        if canister_writer is None:
+            return
+
         mongo_client = MongoClientConfigurator(
             config_path=pymongo_config_path,
             environment=environment
@@ -214,14 +654,272 @@ class MongoDumper:
 
         Canister.set_client(mongo_client)
 
-        for canister in Canister.all():
-            match output:
-                case 'csv':
-                    print(canister.to_csv())
-                case 'json':
-                    print(canister.to_json())
-                case '':
-                    pass
+        canisters = Canister.all(
+            projection=Canister.projection(fields_to_output),
+            batch_size=batch_size
+        )
+
+        with canister_writer:
+            for canister in canisters:
+                canister_writer.write(canister)
+
+
+class CanisterLookup:
+    command_name = 'lookup'
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def read_ids(stream):
+        for line in stream:
+            canister_id = line.strip()
+            if canister_id and not canister_id.startswith('#'):
+                yield canister_id
+
+    async def lookup(
+        self,
+        ids_file=None,
+        output='csv',
+        fields_to_output=None,
+        concurrency=Canister.DEFAULT_LOOKUP_CONCURRENCY,
+        output_file=None,
+        compression=None,
+        api_throttle=None,
+        cache=None
+    ):
+        canister_writer = CanisterWriter.for_output(
+            output or 'csv',
+            fields_to_output=fields_to_output,
+            output_file=output_file,
+            compression=compression
+        )
+
+        stream = sys.stdin if ids_file in (None, '-') else open(ids_file, 'r')
+        missing = 0
+
+        try:
+            with canister_writer:
+                async with aclosing(Canister.from_internet_computer_many(
+                    self.read_ids(stream),
+                    concurrency=concurrency,
+                    throttle=api_throttle,
+                    cache=cache
+                )) as results:
+                    async for canister_id, canister in results:
+                        if canister is None:
+                            print(f'Not found: {canister_id}', file=sys.stderr)
+                            missing += 1
+                        else:
+                            canister_writer.write(canister)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        return canister_writer.count, missing
+
+
+class CanisterStatsReporter:
+    command_name = 'stats'
+
+    output_formats = ['csv', 'json', 'ndjson']
+
+    def __init__(self):
+        pass
+
+    def report(
+        self,
+        pymongo_config_path,
+        environment,
+        report,
+        output='csv',
+        limit=CanisterStatistics.DEFAULT_LIMIT,
+        output_file=None,
+        compression=None
+    ):
+        output = output or 'csv'
+        if output not in self.output_formats:
+            raise ValueError(f"stats can be written as {', '.join(self.output_formats)}, not {output}.")
+
+        mongo_client = MongoClientConfigurator(
+            config_path=pymongo_config_path,
+            environment=environment
+        ).from_config()
+
+        canister_writer = CanisterWriter.for_output(
+            output,
+            fields_to_output=CanisterStatistics.report_fields[report],
+            output_file=output_file,
+            compression=compression
+        )
+
+        with canister_writer:
+            for row in CanisterStatistics(mongo_client, limit=limit).run(report):
+                canister_writer.write(row)
+
+
+class CanisterControllerQuery:
+    command_name = 'by_controller'
+
+    def __init__(self):
+        pass
+
+    def query(
+        self,
+        pymongo_config_path,
+        environment,
+        controllers,
+        output='csv',
+        fields_to_output=None,
+        page_size=Canister.DEFAULT_PAGE_SIZE,
+        limit=0,
+        after=None,
+        output_file=None,
+        compression=None
+    ):
+        if not controllers:
+            raise ValueError('by_controller needs at least one controller.')
+
+        mongo_client = MongoClientConfigurator(
+            config_path=pymongo_config_path,
+            environment=environment
+        ).from_config()
+
+        Canister.set_client(mongo_client)
+
+        canister_writer = CanisterWriter.for_output(
+            output or 'csv',
+            fields_to_output=fields_to_output,
+            output_file=output_file,
+            compression=compression
+        )
+
+        with canister_writer:
+            while True:
+                page_limit = page_size if not limit else min(page_size, limit - canister_writer.count)
+
+                page = Canister.by_controllers(
+                    controllers,
+                    after=after,
+                    limit=page_limit,
+                    projection=Canister.projection(fields_to_output)
+                )
+
+                for canister in page:
+                    canister_writer.write(canister)
+
+                if len(page) < page_limit:
+                    return None
+
+                after = page[-1].canister_id
+
+                if limit and canister_writer.count >= limit:
+                    print(f'Stopped at {limit} canisters; continue with --after {after}', file=sys.stderr)
+                    return after
+
+
+class CanisterSnapshotCompiler:
+    command_name = 'snapshot'
+
+    sources = ['mongo', 'api']
+
+    def __init__(self):
+        pass
+
+    async def compile(
+        self,
+        output_file,
+        source='mongo',
+        pymongo_config_path=DEFAULT_PYMONGO_CONFIG_PATH,
+        environment=DEFAULT_ENVIRONMENT,
+        source_url=DEFAULT_SOURCE_URL,
+        batch_size=Canister.DEFAULT_BATCH_SIZE,
+        concurrency=CanisterDataFetcher.DEFAULT_CONCURRENCY,
+        api_throttle=None,
+        cache=None
+    ):
+        if not output_file:
+            raise ValueError('snapshot needs an --output_file to write to.')
+
+        with CanisterSnapshotWriter(output_file) as snapshot:
+            match source:
+                case 'mongo':
+                    Canister.set_client(MongoClientConfigurator(
+                        config_path=pymongo_config_path,
+                        environment=environment
+                    ).from_config())
+
+                    for canister in Canister.all(sort=[('canister_id', 1)], batch_size=batch_size):
+                        snapshot.add(canister)
+                case 'api':
+                    data_fetcher = CanisterDataFetcher(
+                        source_url,
+                        concurrency=concurrency,
+                        ordered=False,
+                        throttle=api_throttle,
+                        cache=cache
+                    )
+
+                    async with aclosing(data_fetcher.fetch_async()) as canisters:
+                        async for canister in canisters:
+                            snapshot.add(canister)
+                case _:
+                    raise ValueError(f'Unknown snapshot source: {source}')
+
+        print(f'Wrote {snapshot.count} canisters to {output_file}.')
+
+
+class CanisterSnapshotDiffer:
+    command_name = 'diff'
+
+    mongo_location = 'mongo'
+
+    def __init__(self):
+        pass
+
+    def diff(
+        self,
+        old_location,
+        new_location,
+        pymongo_config_path=DEFAULT_PYMONGO_CONFIG_PATH,
+        environment=DEFAULT_ENVIRONMENT,
+        batch_size=Canister.DEFAULT_BATCH_SIZE,
+        output_file=None,
+        compression=None
+    ):
+        if not old_location or not new_location:
+            raise ValueError('diff needs an --old and a --new snapshot, or mongo for the live collection.')
+
+        if self.mongo_location in (old_location, new_location):
+            Canister.set_client(MongoClientConfigurator(
+                config_path=pymongo_config_path,
+                environment=environment
+            ).from_config())
+
+        with ExitStack() as stack:
+            def canisters(location):
+                if location == self.mongo_location:
+                    return Canister.all(sort=[('canister_id', 1)], batch_size=batch_size)
+
+                return iter(stack.enter_context(CanisterSnapshot(location)))
+
+            canister_diff = CanisterDiff(canisters(old_location), canisters(new_location))
+
+            stream = sys.stdout
+            if output_file:
+                stream = stack.enter_context(CanisterWriter.open_file(output_file, compression))
+
+            for change in canister_diff.changes():
+                stream.write(CanisterWriter.json_dumps(change) + '\n')
+
+        counts = canister_diff.counts
+        print(
+            f"Added {counts['added']}, removed {counts['removed']}, changed {counts['changed']} "
+            f"and left {counts['unchanged']} canisters unchanged.",
+            file=sys.stderr
+        )
+
+        return counts
 
 
 class InventoryCommand:
@@ -235,17 +933,78 @@ class InventoryCommand:
                 CanisterFetcher.command_name,
                 MongoDumper.command_name,
                 MongoValidator.command_name,
-                CanisterWebStatusFetcher.command_name
+                CanisterWebStatusFetcher.command_name,
+                CanisterSynchronizer.command_name,
+                CanisterLookup.command_name,
+                CanisterStatsReporter.command_name,
+                CanisterControllerQuery.command_name,
+                CanisterSnapshotCompiler.command_name,
+                CanisterSnapshotDiffer.command_name
             ],
             type=str,
             help='The inventory command to execute.')
 
+        parser.add_argument(
+            '--api_rate',
+            type=float,
+            default=None,
+            help='The maximum number of Canisters API requests per second.')
+
+        parser.add_argument(
+            '--after',
+            type=str,
+            default=None,
+            help='Continue a by_controller listing after this canister id.')
+
+        parser.add_argument(
+            '-b',
+            '--batch_size',
+            type=int,
+            default=CanisterBulkWriter.DEFAULT_BATCH_SIZE,
+            help='The number of canisters to read or write per MongoDB round trip.')
+
+        parser.add_argument(
+            '--cache_dir',
+            type=str,
+            default=None,
+            help='Cache Canisters API responses in this directory.')
+
+        parser.add_argument(
+            '--cache_max_size',
+            type=int,
+            default=ResponseCache.DEFAULT_MAX_SIZE,
+            help='The number of bytes the response cache may use before evicting the least recently used responses.')
+
+        parser.add_argument(
+            '--cache_ttl',
+            type=float,
+            default=ResponseCache.DEFAULT_TTL,
+            help='The number of seconds a cached response is served without revalidating it.')
+
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default=None,
+            help="Periodically checkpoint progress to this file, or to MongoDB when set to 'mongo'.")
+
+        parser.add_argument(
+            '--checkpoint_interval',
+            type=float,
+            default=CrawlCheckpoint.DEFAULT_INTERVAL,
+            help='The number of seconds between checkpoints.')
+
         parser.add_argument(
             '-c',
             '--class_name',
             type=str,
             help='The class name that represents the collection in MongoDB.')
 
+        parser.add_argument(
+            '--controller',
+            action='append',
+            default=[],
+            help='A controller principal to list canisters for; may be given more than once.')
+
         parser.add_argument(
             '-e',
             '--environment',
@@ -261,6 +1020,33 @@ class InventoryCommand:
             nargs='+',
             help='The fields to export.')
 
+        parser.add_argument(
+            '--flush_interval',
+            type=float,
+            default=CanisterBulkWriter.DEFAULT_FLUSH_INTERVAL,
+            help='The maximum number of seconds to buffer canisters before writing them to MongoDB.')
+
+        parser.add_argument(
+            '-i',
+            '--ids_file',
+            type=str,
+            default=None,
+            help="The file of canister ids, or controllers for by_controller, one per line; '-' reads stdin.")
+
+        parser.add_argument(
+            '-j',
+            '--workers',
+            type=int,
+            default=1,
+            help='The number of processes that dump MongoDB partitions in parallel.')
+
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help=f'The maximum number of rows to output, 0 for every row. '
+                 f'Stats reports default to {CanisterStatistics.DEFAULT_LIMIT}, by_controller to every row.')
+
         parser.add_argument(
             '-m',
             '--max_canister_count',
@@ -268,13 +1054,62 @@ class InventoryCommand:
             default=DEFAULT_MAXIMUM_CANISTER_COUNT,
             help='Break execution when the canister limit has been exceeded.')
 
+        parser.add_argument(
+            '--max_age',
+            type=float,
+            default=None,
+            help='Re-probe canisters last probed more than this many seconds ago, as well as '
+                 'unverified canisters and canisters whose module_hash changed since their last probe.')
+
+        parser.add_argument(
+            '--merge',
+            action='store_true',
+            help='Merge the files written by parallel dump workers into the output file.')
+
+        parser.add_argument(
+            '-n',
+            '--concurrency',
+            type=int,
+            default=CanisterDataFetcher.DEFAULT_CONCURRENCY,
+            help='The number of canister pages to fetch concurrently.')
+
+        parser.add_argument(
+            '--new',
+            type=str,
+            default=None,
+            help="The newer side of a diff: a snapshot file, or 'mongo' for the live collection.")
+
+        parser.add_argument(
+            '--offline',
+            action='store_true',
+            help='Serve Canisters API responses only from the response cache.')
+
+        parser.add_argument(
+            '--old',
+            type=str,
+            default=None,
+            help="The older side of a diff: a snapshot file, or 'mongo' for the live collection.")
+
         parser.add_argument(
             '-o',
             '--output',
             default='',
-            choices=['', 'csv', 'json'],
+            choices=['', 'csv', 'json', 'ndjson', 'parquet'],
             help='Print the fetched results.')
 
+        parser.add_argument(
+            '--output_file',
+            type=str,
+            default=None,
+            help='Write the results to this file instead of printing them.')
+
+        parser.add_argument(
+            '-z',
+            '--compression',
+            default=None,
+            choices=CanisterWriter.compressions,
+            help='Compress the output file. Inferred from a .gz or .zst extension when not set.')
+
         parser.add_argument(
             '-p',
             '--pymongo_config',
@@ -282,12 +1117,108 @@ class InventoryCommand:
             default=DEFAULT_PYMONGO_CONFIG_PATH,
             help='The pymongo config file to use.')
 
+        parser.add_argument(
+            '--partition_key',
+            default=ParallelCanisterDump.DEFAULT_PARTITION_KEY,
+            choices=ParallelCanisterDump.partition_keys,
+            help='The indexed field used to partition a parallel dump.')
+
+        parser.add_argument(
+            '--probe_method',
+            default=CanisterProbe.DEFAULT_METHOD,
+            choices=CanisterProbe.methods,
+            help='The HTTP method used to probe whether a canister is a web canister.')
+
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='The number of processes that probe disjoint shards of canisters.')
+
+        parser.add_argument(
+            '--probes_per_second',
+            type=float,
+            default=None,
+            help='The maximum number of web canister probes per second.')
+
+        parser.add_argument(
+            '--probe_concurrency',
+            type=int,
+            default=CanisterPipeline.DEFAULT_PROBE_CONCURRENCY,
+            help='The number of canisters to probe concurrently while fetching.')
+
+        parser.add_argument(
+            '--probe_connect_timeout',
+            type=float,
+            default=CanisterProbe.DEFAULT_CONNECT_TIMEOUT,
+            help='The number of seconds to wait for a probe connection.')
+
+        parser.add_argument(
+            '--probe_read_timeout',
+            type=float,
+            default=CanisterProbe.DEFAULT_READ_TIMEOUT,
+            help='The number of seconds to wait for a probe response.')
+
+        parser.add_argument(
+            '-q',
+            '--queue_size',
+            type=int,
+            default=CanisterWebStatusFetcher.DEFAULT_QUEUE_SIZE,
+            help='The maximum number of canisters waiting in each processing queue.')
+
+        parser.add_argument(
+            '--report',
+            default=CanisterStatistics.reports[0],
+            choices=CanisterStatistics.reports,
+            help='The stats report to compute.')
+
+        parser.add_argument(
+            '-r',
+            '--resume',
+            action='store_true',
+            help='Continue from the last checkpoint.')
+
+        parser.add_argument(
+            '--rescan',
+            action='store_true',
+            help='Compare already synced canisters against MongoDB as well as fetching new ones.')
+
+        parser.add_argument(
+            '--retry_attempts',
+            type=int,
+            default=EndpointThrottle.DEFAULT_ATTEMPTS,
+            help='The number of attempts for a request that is rate limited, unavailable or timed out.')
+
         parser.add_argument(
             '-s',
             '--store_to_mongo',
             action='store_true',
             help='Store the fetched results.')
 
+        parser.add_argument(
+            '--shard_count',
+            type=int,
+            default=1,
+            help='The number of hosts that split the canisters between them.')
+
+        parser.add_argument(
+            '--shard_index',
+            type=int,
+            default=0,
+            help='The shard of canisters this host processes, from 0 to shard_count - 1.')
+
+        parser.add_argument(
+            '--skip_unchanged',
+            action='store_true',
+            help='With -s, skip canisters that are already stored with the same controllers, '
+                 'module_hash and subnet_id. With -w they are not output either, since they are not probed.')
+
+        parser.add_argument(
+            '--source',
+            default=CanisterSnapshotCompiler.sources[0],
+            choices=CanisterSnapshotCompiler.sources,
+            help='Where a snapshot reads canisters from.')
+
         parser.add_argument(
             '-t',
             '--max_time',
@@ -302,6 +1233,11 @@ class InventoryCommand:
             default=DEFAULT_SOURCE_URL,
             help='The url that contains canister metadata.')
 
+        parser.add_argument(
+            '--unordered',
+            action='store_true',
+            help='Emit canisters as their pages arrive instead of in index order.')
+
         parser.add_argument(
             '-w',
             '--web-canister',
@@ -313,11 +1249,40 @@ class InventoryCommand:
 
         self.args = self.parser.parse_args()
 
+        if self.args.offline and not self.args.cache_dir:
+            self.parser.error('--offline needs a --cache_dir to serve responses from.')
+
     async def run(self):
         args = self.args
+
+        probe_options = {
+            'method': args.probe_method,
+            'connect_timeout': args.probe_connect_timeout,
+            'read_timeout': args.probe_read_timeout,
+            'rate': args.probes_per_second,
+            'attempts': args.retry_attempts,
+        }
+
+        probe = CanisterProbe(**probe_options)
+
+        api_throttle = EndpointThrottle(
+            'canisters_api',
+            initial_concurrency=args.concurrency,
+            maximum_concurrency=args.concurrency,
+            rate=args.api_rate,
+            attempts=args.retry_attempts
+        )
+
+        cache = ResponseCache(
+            args.cache_dir,
+            ttl=args.cache_ttl,
+            max_size=args.cache_max_size,
+            offline=args.offline
+        ) if args.cache_dir else None
+
         match args.command:
             case CanisterFetcher.command_name:
-                CanisterFetcher().fetch(
+                await CanisterFetcher().fetch(
                     source_url=args.source_url,
                     pymongo_config_path=args.pymongo_config,
                     environment=args.environment,
@@ -326,18 +1291,143 @@ class InventoryCommand:
                     output=args.output,
                     maximum_canister_count=args.max_canister_count,
                     maximum_time_limit=args.max_time,
-                    verify_web_canister=args.web_canister
+                    verify_web_canister=args.web_canister,
+                    concurrency=args.concurrency,
+                    ordered=not args.unordered,
+                    batch_size=args.batch_size,
+                    flush_interval=args.flush_interval,
+                    probe=probe,
+                    probe_concurrency=args.probe_concurrency,
+                    queue_size=args.queue_size,
+                    checkpoint_location=args.checkpoint,
+                    checkpoint_interval=args.checkpoint_interval,
+                    resume=args.resume,
+                    output_file=args.output_file,
+                    compression=args.compression,
+                    api_throttle=api_throttle,
+                    cache=cache,
+                    skip_unchanged=args.skip_unchanged
                 )
             case MongoDumper.command_name:
                 MongoDumper().dump(
                     pymongo_config_path=args.pymongo_config,
                     environment=args.environment,
-                    output=args.output
+                    output=args.output,
+                    fields_to_output=args.fields_to_output,
+                    batch_size=args.batch_size,
+                    output_file=args.output_file,
+                    compression=args.compression,
+                    workers=args.workers,
+                    merge=args.merge,
+                    partition_key=args.partition_key
                 )
             case CanisterWebStatusFetcher.command_name:
-                await CanisterWebStatusFetcher().populate(
+                fetcher_options = {
+                    'batch_size': args.batch_size,
+                    'flush_interval': args.flush_interval,
+                    'queue_size': args.queue_size,
+                    'scheduler': CanisterProbeScheduler(args.max_age) if args.max_age else None,
+                }
+
+                populate_options = {
+                    'pymongo_config_path': args.pymongo_config,
+                    'environment': args.environment,
+                    'checkpoint_location': args.checkpoint,
+                    'checkpoint_interval': args.checkpoint_interval,
+                    'resume': args.resume,
+                }
+
+                if args.processes > 1:
+                    CanisterWebStatusFetcher.populate_in_processes(
+                        args.processes,
+                        fetcher_options,
+                        probe_options,
+                        populate_options,
+                        shard_index=args.shard_index,
+                        shard_count=args.shard_count
+                    )
+                else:
+                    await CanisterWebStatusFetcher(
+                        probe=probe,
+                        shard_index=args.shard_index,
+                        shard_count=args.shard_count,
+                        **fetcher_options
+                    ).populate(**populate_options)
+            case CanisterSynchronizer.command_name:
+                await CanisterSynchronizer().sync(
                     pymongo_config_path=args.pymongo_config,
-                    environment=args.environment
+                    environment=args.environment,
+                    source_url=args.source_url,
+                    verify_web_canister=args.web_canister,
+                    concurrency=args.concurrency,
+                    batch_size=args.batch_size,
+                    flush_interval=args.flush_interval,
+                    probe=probe,
+                    state_location=args.checkpoint or CrawlCheckpoint.mongo_location,
+                    rescan=args.rescan,
+                    api_throttle=api_throttle,
+                    cache=cache
+                )
+            case CanisterLookup.command_name:
+                await CanisterLookup().lookup(
+                    ids_file=args.ids_file,
+                    output=args.output,
+                    fields_to_output=args.fields_to_output,
+                    concurrency=args.concurrency,
+                    output_file=args.output_file,
+                    compression=args.compression,
+                    api_throttle=api_throttle,
+                    cache=cache
+                )
+            case CanisterStatsReporter.command_name:
+                CanisterStatsReporter().report(
+                    pymongo_config_path=args.pymongo_config,
+                    environment=args.environment,
+                    report=args.report,
+                    output=args.output,
+                    limit=args.limit if args.limit is not None else CanisterStatistics.DEFAULT_LIMIT,
+                    output_file=args.output_file,
+                    compression=args.compression
+                )
+            case CanisterControllerQuery.command_name:
+                controllers = list(args.controller)
+                if args.ids_file:
+                    with (open(args.ids_file, 'r') if args.ids_file != '-' else nullcontext(sys.stdin)) as stream:
+                        controllers.extend(CanisterLookup.read_ids(stream))
+
+                CanisterControllerQuery().query(
+                    pymongo_config_path=args.pymongo_config,
+                    environment=args.environment,
+                    controllers=controllers,
+                    output=args.output,
+                    fields_to_output=args.fields_to_output,
+                    page_size=args.batch_size,
+                    limit=args.limit or 0,
+                    after=args.after,
+                    output_file=args.output_file,
+                    compression=args.compression
+                )
+            case CanisterSnapshotCompiler.command_name:
+                await CanisterSnapshotCompiler().compile(
+                    output_file=args.output_file,
+                    source=args.source,
+                    pymongo_config_path=args.pymongo_config,
+                    environment=args.environment,
+                    source_url=args.source_url,
+                    batch_size=args.batch_size,
+                    concurrency=args.concurrency,
+                    api_throttle=api_throttle,
+                    cache=cache
+                )
+            case CanisterSnapshotDiffer.command_name:
+                CanisterSnapshotDiffer().diff(
+                    old_location=args.old,
+                    new_location=args.new,
+                    pymongo_config_path=args.pymongo_config,
+                    environment=args.environment,
+                    batch_size=args.batch_size,
+                    output_file=args.output_file,
+                    compression=args.compression
                 )
             case MongoValidator.command_name:
                 MongoValidator(
@@ -0,0 +1,93 @@
+class CanisterDiff:
+    compared_fields = [
+        'controllers',
+        'is_web_canister',
+        'last_status_code',
+        'module_hash',
+        'subnet_id',
+    ]
+
+    def __init__(self, old_canisters, new_canisters, fields=None):
+        self.__old_canisters = old_canisters
+        self.__new_canisters = new_canisters
+        self.__fields = list(fields) if fields else list(self.compared_fields)
+        self.__counts = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0}
+
+    @property
+    def fields(self):
+        return self.__fields
+
+    @property
+    def counts(self):
+        return self.__counts
+
+    @staticmethod
+    def value(canister, field):
+        value = getattr(canister, field)
+
+        # Controller order carries no meaning.
+        if field == 'controllers' and value is not None:
+            return sorted(value)
+
+        return value
+
+    def changed_fields(self, old_canister, new_canister):
+        changes = {}
+
+        for field in self.fields:
+            old_value = self.value(old_canister, field)
+            new_value = self.value(new_canister, field)
+
+            if old_value != new_value:
+                changes[field] = {'old': old_value, 'new': new_value}
+
+        return changes
+
+    @staticmethod
+    def sorted_canisters(canisters, side):
+        previous_id = None
+
+        # The merge is only correct over canister_id order, so an unsorted
+        # source fails loudly instead of reporting bogus changes.
+        for canister in canisters:
+            if previous_id is not None and canister.canister_id <= previous_id:
+                raise ValueError(
+                    f'The {side} canisters are not sorted by canister_id at {canister.canister_id}.'
+                )
+
+            previous_id = canister.canister_id
+            yield canister
+
+    def changes(self):
+        old_canisters = self.sorted_canisters(self.__old_canisters, 'old')
+        new_canisters = self.sorted_canisters(self.__new_canisters, 'new')
+
+        old_canister = next(old_canisters, None)
+        new_canister = next(new_canisters, None)
+
+        while old_canister is not None or new_canister is not None:
+            old_id = old_canister.canister_id if old_canister is not None else None
+            new_id = new_canister.canister_id if new_canister is not None else None
+
+            if new_id is None or (old_id is not None and old_id < new_id):
+                yield self.__event('removed', old_canister)
+                old_canister = next(old_canisters, None)
+            elif old_id is None or new_id < old_id:
+                yield self.__event('added', new_canister)
+                new_canister = next(new_canisters, None)
+            else:
+                changes = self.changed_fields(old_canister, new_canister)
+
+                if changes:
+                    self.__counts['changed'] += 1
+                    yield {'event': 'changed', 'canister_id': new_id, 'changes': changes}
+                else:
+                    self.__counts['unchanged'] += 1
+
+                old_canister = next(old_canisters, None)
+                new_canister = next(new_canisters, None)
+
+    def __event(self, event, canister):
+        self.__counts[event] += 1
+
+        return {'event': event, 'canister_id': canister.canister_id, 'canister': canister.to_document()}
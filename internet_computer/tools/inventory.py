@@ -1,10 +1,22 @@
+import asyncio
 import json
+import time
+from collections import deque
+from contextlib import aclosing
+from itertools import islice
 from string import Template
+from sys import intern
 
 import aiohttp
 import requests
 from pymongo.database import Database
 
+from internet_computer.tools.cache import ResponseCache
+from internet_computer.tools.persistence import CanisterBulkWriter
+from internet_computer.tools.probe import CanisterProbe, SyncCanisterProbe
+from internet_computer.tools.throttle import EndpointThrottle
+from internet_computer.tools.writers import CsvCanisterWriter
+
 
 class Canister:
     raw_canister_url_template = Template('https://$canister_id.raw.ic0.app/')
@@ -17,6 +29,25 @@ class Canister:
 
     collection_name: str = 'canisters'
 
+    DEFAULT_BATCH_SIZE = 1000
+    DEFAULT_LOOKUP_CONCURRENCY = 8
+    DEFAULT_PAGE_SIZE = 100
+
+    controllers_index = [('controllers', 1), ('canister_id', 1)]
+
+    # Slotted storage keeps large in-memory sets of canisters compact.
+    __slots__ = (
+        '__id',
+        '__canister_id',
+        '__controllers',
+        '__module_hash',
+        '__subnet_id',
+        '__last_status_code',
+        '__is_web_canister',
+        '__last_probed_at',
+        '__module_hash_changed_at',
+    )
+
     def __init__(
         self,
         _id=None,
@@ -25,15 +56,21 @@ class Canister:
         module_hash=None,
         subnet_id=None,
         last_status_code=None,
-        is_web_canister=None
+        is_web_canister=None,
+        last_probed_at=None,
+        module_hash_changed_at=None
     ):
         self.__id = _id
         self.__canister_id = canister_id
         self.__controllers = controllers
         self.__module_hash = module_hash
-        self.__subnet_id = subnet_id
+        # A few dozen subnets are shared by every canister, so interning
+        # keeps one copy of each; controllers are too varied to pay for it.
+        self.__subnet_id = None if subnet_id is None else intern(subnet_id)
         self.__last_status_code = last_status_code
         self.__is_web_canister = is_web_canister
+        self.__last_probed_at = last_probed_at
+        self.__module_hash_changed_at = module_hash_changed_at
 
     @property
     def _id(self):
@@ -55,10 +92,18 @@ class Canister:
     def last_status_code(self):
         return self.__last_status_code
 
+    @property
+    def last_probed_at(self):
+        return self.__last_probed_at
+
     @property
     def module_hash(self):
         return self.__module_hash
 
+    @property
+    def module_hash_changed_at(self):
+        return self.__module_hash_changed_at
+
     @property
     def subnet_id(self):
         return self.__subnet_id
@@ -67,34 +112,31 @@ class Canister:
     def raw_canister_url(self):
         return self.raw_canister_url_template.substitute(canister_id=self.canister_id)
 
-    async def verify_web_canister_async(self, existing_session=None, save=False):
-        if existing_session is None:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    self.raw_canister_url
-                ) as resp:
-                    last_status_code = resp.status
-        else:
-            async with existing_session.get(
-                self.raw_canister_url
-            ) as resp:
-                last_status_code = resp.status
-
-        self.__last_status_code = last_status_code
+    def record_status_code(self, status_code):
+        self.__last_status_code = status_code
+        self.__last_probed_at = time.time()
 
         self.__is_web_canister = self.last_status_code not in type(self).non_web_canister_status_codes
 
+        return self.__is_web_canister
+
+    async def verify_web_canister_async(self, probe=None, save=False):
+        if probe is None:
+            async with CanisterProbe() as probe:
+                return await self.verify_web_canister_async(probe, save)
+
+        self.record_status_code(await probe.status(self.raw_canister_url))
+
         if save:
             self.save()
 
         return self.__is_web_canister
 
-    def verify_web_canister(self, save=False):
-        self.__last_status_code = requests.get(
-            self.raw_canister_url
-        ).status_code
+    def verify_web_canister(self, save=False, probe=None):
+        if probe is None:
+            probe = SyncCanisterProbe.shared()
 
-        self.__is_web_canister = self.last_status_code not in type(self).non_web_canister_status_codes
+        self.record_status_code(probe.status(self.raw_canister_url))
 
         if save:
             self.save()
@@ -104,10 +146,7 @@ class Canister:
     def save(self):
         client = type(self).get_client()
 
-        insertion_data = self.to_dict()
-
-        insertion_data.pop('_id')
-        insertion_data.pop('raw_canister_url')
+        insertion_data = self.to_document()
 
         if self.__id is None:
             self.__id = client.canisters.insert_one(insertion_data).inserted_id
@@ -117,34 +156,31 @@ class Canister:
                 {'$set': insertion_data}
             )
 
+    def to_document(self):
+        document = self.to_dict()
+
+        document.pop('_id')
+        document.pop('raw_canister_url')
+
+        return document
+
     def to_dict(self):
         return {
             '_id': str(self._id),
             'canister_id': self.canister_id,
             'controllers': self.controllers,
             'is_web_canister': self.__is_web_canister,
+            'last_probed_at': self.last_probed_at,
             'last_status_code': self.last_status_code,
             'module_hash': self.module_hash,
+            'module_hash_changed_at': self.module_hash_changed_at,
             'raw_canister_url': self.raw_canister_url,
             'subnet_id': self.subnet_id,
 
         }
 
     def to_csv(self, fields_to_output=None):
-        fields = self.to_dict()
-
-        if fields_to_output:
-            return ','.join([str(fields[field]) for field in fields_to_output])
-
-        return ','.join([
-            str(self._id),
-            self.canister_id,
-            ' '.join(self.controllers),
-            str(self.is_web_canister),
-            str(self.last_status_code),
-            self.module_hash,
-            self.subnet_id,
-        ])
+        return CsvCanisterWriter(fields_to_output=fields_to_output).row(self).rstrip('\n')
 
     def to_json(self, fields_to_output=None):
         fields = self.to_dict()
@@ -186,6 +222,10 @@ class Canister:
         client[cls.collection_name].create_index([('canister_id', 1)], unique=True)
         client[cls.collection_name].create_index([('subnet_id', 1)])
         client[cls.collection_name].create_index([('module_hash', 1)])
+        client[cls.collection_name].create_index([('last_probed_at', 1)])
+        # Multikey on controllers, ordered by canister_id within each
+        # controller so pages can be keyed on canister_id.
+        client[cls.collection_name].create_index(cls.controllers_index)
 
     @classmethod
     def find(cls, criteria):
@@ -194,22 +234,158 @@ class Canister:
         return cls(**found)
 
     @classmethod
-    def from_internet_computer(cls, canister_id):
-        return cls(
-            **requests.get(
-                cls.canister_index_template.substitute(canister_id=canister_id)
-            ).json()
+    def from_internet_computer(cls, canister_id, cache: ResponseCache = None):
+        url = cls.canister_index_template.substitute(canister_id=canister_id)
+
+        if cache is not None:
+            return cls(**json.loads(cache.get(url)[1]))
+
+        return cls(**requests.get(url).json())
+
+    @classmethod
+    async def from_internet_computer_async(
+        cls,
+        session,
+        canister_id,
+        throttle: EndpointThrottle = None,
+        cache: ResponseCache = None
+    ):
+        url = cls.canister_index_template.substitute(canister_id=canister_id)
+
+        body = cache.cached(url) if cache is not None else None
+        if body is not None:
+            return cls(**json.loads(body))
+
+        async def fetch():
+            if cache is not None:
+                status, body = await cache.get_async(session, url)
+            else:
+                async with session.get(url) as resp:
+                    status, body = resp.status, await resp.text()
+
+            if throttle is not None and status in throttle.retry_statuses:
+                return status, None
+
+            return status, (status, body)
+
+        if throttle is None:
+            _, (status, body) = await fetch()
+        else:
+            status, body = await throttle.request(fetch)
+
+        if status == 404:
+            return None
+
+        if status != 200:
+            raise Exception(f'Looking up {canister_id} failed with HTTP {status}.')
+
+        return cls(**json.loads(body))
+
+    @classmethod
+    async def from_internet_computer_many(
+        cls,
+        canister_ids,
+        session=None,
+        concurrency=DEFAULT_LOOKUP_CONCURRENCY,
+        throttle: EndpointThrottle = None,
+        cache: ResponseCache = None
+    ):
+        # Yields (canister_id, canister) as lookups complete; the canister is
+        # None when the API does not know the id.
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                async with aclosing(
+                    cls.from_internet_computer_many(canister_ids, session, concurrency, throttle, cache)
+                ) as results:
+                    async for result in results:
+                        yield result
+            return
+
+        if throttle is None:
+            throttle = EndpointThrottle('canisters_api', maximum_concurrency=concurrency)
+
+        async def lookup(canister_id):
+            return canister_id, await cls.from_internet_computer_async(session, canister_id, throttle, cache)
+
+        # Ids are drawn lazily, so a long id stream is never held in memory.
+        canister_ids = iter(canister_ids)
+        pending = {
+            asyncio.create_task(lookup(canister_id))
+            for canister_id in islice(canister_ids, concurrency)
+        }
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for canister_id in islice(canister_ids, len(done)):
+                    pending.add(asyncio.create_task(lookup(canister_id)))
+
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @classmethod
+    def by_controllers(cls, controllers, after=None, limit=DEFAULT_PAGE_SIZE, projection=None):
+        # Pages continue after the last canister_id seen rather than skipping,
+        # so a deep page costs the same as the first.
+        query_filter = {'controllers': {'$in': list(controllers)}}
+        if after is not None:
+            query_filter['canister_id'] = {'$gt': after}
+
+        if projection:
+            projection = {**projection, 'canister_id': 1}
+
+        finder = cls.get_client()[cls.collection_name].find(
+            query_filter,
+            projection,
+            sort=[('canister_id', 1)],
+            limit=limit
         )
 
+        return [cls(**document) for document in finder]
+
+    @classmethod
+    def by_controller(cls, controller, after=None, limit=DEFAULT_PAGE_SIZE, projection=None):
+        return cls.by_controllers([controller], after, limit, projection)
+
     @classmethod
-    def all(cls, query_filter=None):
+    def all(
+        cls,
+        query_filter=None,
+        projection=None,
+        sort=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        raw=False
+    ):
         client = cls.get_client()
-        finder = client[cls.collection_name].find(query_filter)
-        while True:
-            try:
-                yield cls(**finder.next())
-            except StopIteration:
-                break
+        finder = client[cls.collection_name].find(
+            query_filter,
+            projection,
+            sort=sort,
+            batch_size=batch_size
+        )
+
+        if raw:
+            yield from finder
+            return
+
+        for document in finder:
+            yield cls(**document)
+
+    @classmethod
+    def projection(cls, fields_to_output):
+        if not fields_to_output:
+            return None
+
+        # raw_canister_url is derived from canister_id rather than stored.
+        fields = {field for field in fields_to_output if field != 'raw_canister_url'}
+        if 'raw_canister_url' in fields_to_output:
+            fields.add('canister_id')
+
+        return {field: 1 for field in fields}
 
     @classmethod
     def json_header(cls):
@@ -221,19 +397,57 @@ class Canister:
 
 
 class CanisterMetadata:
-    def __init__(self, source_url, offset, limit):
+    def __init__(self, source_url, offset, limit, cache: ResponseCache = None):
         self.__source_url = source_url
         self.__offset = offset
         self.__limit = limit
+        self.__cache = cache
         self.__json_data = None
         self.__total_canisters = None
         self.__max_canister_index = None
 
+    @property
+    def url(self):
+        return f'{self.__source_url}?offset={self.__offset}&limit={self.__limit}'
+
     def __fetch_data(self):
-        json_data = requests.get(
-            f'{self.__source_url}?offset={self.__offset}&limit={self.__limit}'
-        ).json()
+        if self.__cache is not None:
+            self.__load(json.loads(self.__cache.get(self.url)[1]))
+        else:
+            self.__load(requests.get(self.url).json())
+
+    async def fetch_async(self, session, throttle=None):
+        # Cache hits skip the throttle, they cost the API nothing.
+        if self.__cache is not None:
+            body = self.__cache.cached(self.url)
+            if body is not None:
+                self.__load(json.loads(body))
+                return self
+
+        async def fetch():
+            if self.__cache is not None:
+                status, body = await self.__cache.get_async(session, self.url)
+                if throttle is not None and status in throttle.retry_statuses:
+                    return status, None
+
+                return status, json.loads(body)
+
+            async with session.get(self.url) as resp:
+                if throttle is not None and resp.status in throttle.retry_statuses:
+                    return resp.status, None
+
+                return resp.status, await resp.json()
 
+        if throttle is None:
+            _, json_data = await fetch()
+        else:
+            json_data = await throttle.request(fetch)
+
+        self.__load(json_data)
+
+        return self
+
+    def __load(self, json_data):
         self.__total_canisters = json_data['total_canisters']
         self.__max_canister_index = json_data['max_canister_index']
         self.__json_data = json_data['data']
@@ -261,10 +475,30 @@ class CanisterMetadata:
 
 
 class CanisterDataFetcher:
-    def __init__(self, source_url, limit=100, offset=0):
+    DEFAULT_CONCURRENCY = 8
+
+    def __init__(
+        self,
+        source_url,
+        limit=100,
+        offset=0,
+        concurrency=DEFAULT_CONCURRENCY,
+        ordered=True,
+        throttle=None,
+        cache: ResponseCache = None
+    ):
         self.__source_url = source_url
         self.__limit = limit
         self.__offset = offset
+        self.__concurrency = max(1, concurrency)
+        self.__ordered = ordered
+        self.__throttle = throttle if throttle is not None else EndpointThrottle(
+            'canisters_api',
+            initial_concurrency=self.__concurrency,
+            maximum_concurrency=self.__concurrency
+        )
+        self.__cache = cache
+        self.__max_canister_index = None
 
     @property
     def source_url(self):
@@ -282,12 +516,33 @@ class CanisterDataFetcher:
     def offset(self, offset):
         self.__offset = offset
 
+    @property
+    def concurrency(self):
+        return self.__concurrency
+
+    @property
+    def ordered(self):
+        return self.__ordered
+
+    @property
+    def throttle(self):
+        return self.__throttle
+
+    @property
+    def cache(self):
+        return self.__cache
+
+    @property
+    def max_canister_index(self):
+        return self.__max_canister_index
+
     def fetch(self):
         while True:
             canister_data = CanisterMetadata(
                 source_url=self.source_url,
                 limit=self.limit,
-                offset=self.offset
+                offset=self.offset,
+                cache=self.cache
             )
 
             if canister_data.data is None:
@@ -301,15 +556,116 @@ class CanisterDataFetcher:
 
             self.offset += self.limit
 
+    def window_offsets(self, max_canister_index):
+        return range(self.offset, max_canister_index + 1, self.limit)
+
+    async def __fetch_window(self, session, offset):
+        canister_data = await CanisterMetadata(
+            source_url=self.source_url,
+            limit=self.limit,
+            offset=offset,
+            cache=self.cache
+        ).fetch_async(session, self.throttle)
+
+        return offset, canister_data.data
+
+    async def fetch_pages_async(self, session=None):
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                async for page in self.fetch_pages_async(session):
+                    yield page
+            return
+
+        # The first page tells us how far the offset space extends, so the
+        # remaining windows can be requested concurrently.
+        first_page = await CanisterMetadata(
+            source_url=self.source_url,
+            limit=self.limit,
+            offset=self.offset,
+            cache=self.cache
+        ).fetch_async(session, self.throttle)
+
+        if first_page.data is None:
+            return
+
+        self.__max_canister_index = first_page.max_canister_index
+
+        yield self.offset, [Canister(**raw) for raw in first_page.data]
+
+        self.offset += self.limit
+
+        offsets = iter(self.window_offsets(first_page.max_canister_index))
+
+        pending = deque(
+            asyncio.create_task(self.__fetch_window(session, offset))
+            for offset in islice(offsets, self.concurrency)
+        )
+
+        try:
+            while pending:
+                if self.ordered:
+                    offset, data = await pending.popleft()
+                else:
+                    done, waiting = await asyncio.wait(
+                        pending,
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                    finished = done.pop()
+                    pending = deque(waiting | done)
+                    offset, data = finished.result()
+
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    pending.append(
+                        asyncio.create_task(self.__fetch_window(session, next_offset))
+                    )
+
+                if self.ordered:
+                    self.offset = offset + self.limit
+
+                if data is None:
+                    continue
+
+                yield offset, [Canister(**raw) for raw in data]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def fetch_async(self, session=None):
+        async with aclosing(self.fetch_pages_async(session)) as pages:
+            async for _, canisters in pages:
+                for canister in canisters:
+                    yield canister
+
 
 class CanisterInventory:
-    def __init__(self, fetcher):
+    def __init__(
+        self,
+        fetcher,
+        batch_size=CanisterBulkWriter.DEFAULT_BATCH_SIZE,
+        flush_interval=CanisterBulkWriter.DEFAULT_FLUSH_INTERVAL
+    ):
         self.__fetcher = fetcher
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
 
     @property
     def fetcher(self):
         return self.__fetcher
 
+    def writer(self):
+        return CanisterBulkWriter(
+            batch_size=self.__batch_size,
+            flush_interval=self.__flush_interval
+        )
+
     def populate(self):
-        for canister in self.fetcher.fetch():
-            canister.save()
+        with self.writer() as writer:
+            for canister in self.fetcher.fetch():
+                writer.add(canister)
+
+    async def populate_async(self):
+        with self.writer() as writer:
+            async with aclosing(self.fetcher.fetch_async()) as canisters:
+                async for canister in canisters:
+                    writer.add(canister)
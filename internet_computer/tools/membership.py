@@ -0,0 +1,89 @@
+import hashlib
+from array import array
+from bisect import bisect_left
+
+from pymongo.database import Database
+
+from internet_computer.tools.inventory import Canister
+
+
+class KnownCanisters:
+    DEFAULT_BATCH_SIZE = 10000
+
+    # The fields the Canisters API supplies; probe results are not part of a
+    # canister's fingerprint.
+    fingerprint_fields = ['controllers', 'module_hash', 'subnet_id']
+
+    def __init__(self, id_hashes=None, fingerprints=None):
+        # Parallel arrays sorted by id hash: 16 bytes per canister, against
+        # hundreds for a set of canister_id strings.
+        self.__id_hashes = id_hashes if id_hashes is not None else array('Q')
+        self.__fingerprints = fingerprints if fingerprints is not None else array('Q')
+
+    @staticmethod
+    def digest(value):
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little')
+
+    @classmethod
+    def id_hash(cls, canister_id):
+        return cls.digest(canister_id)
+
+    @classmethod
+    def fingerprint(cls, controllers, module_hash, subnet_id):
+        return cls.digest('\x1f'.join([
+            ' '.join(sorted(controllers or [])),
+            module_hash or '',
+            subnet_id or '',
+        ]))
+
+    @classmethod
+    def canister_fingerprint(cls, canister):
+        return cls.fingerprint(canister.controllers, canister.module_hash, canister.subnet_id)
+
+    @classmethod
+    def from_documents(cls, documents):
+        # One int per canister, id hash in the high bits, sorts in a fraction
+        # of the memory of (id hash, fingerprint) tuples.
+        entries = sorted(
+            cls.id_hash(document['canister_id']) << 64 | cls.fingerprint(
+                document.get('controllers'),
+                document.get('module_hash'),
+                document.get('subnet_id')
+            )
+            for document in documents
+        )
+
+        return cls(
+            array('Q', (entry >> 64 for entry in entries)),
+            array('Q', (entry & 0xFFFFFFFFFFFFFFFF for entry in entries))
+        )
+
+    @classmethod
+    def load(cls, client: Database, batch_size=DEFAULT_BATCH_SIZE):
+        documents = client[Canister.collection_name].find(
+            {},
+            {'_id': 0, 'canister_id': 1, **{field: 1 for field in cls.fingerprint_fields}},
+            batch_size=batch_size
+        )
+
+        return cls.from_documents(documents)
+
+    def __len__(self):
+        return len(self.__id_hashes)
+
+    def __position(self, canister_id):
+        id_hash = self.id_hash(canister_id)
+        position = bisect_left(self.__id_hashes, id_hash)
+
+        if position < len(self.__id_hashes) and self.__id_hashes[position] == id_hash:
+            return position
+
+        return None
+
+    def __contains__(self, canister_id):
+        return self.__position(canister_id) is not None
+
+    def unchanged(self, canister):
+        position = self.__position(canister.canister_id)
+
+        return position is not None and self.__fingerprints[position] == self.canister_fingerprint(canister)
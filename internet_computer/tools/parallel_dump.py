@@ -0,0 +1,200 @@
+import json
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.pymongo_fixes import MongoClientConfigurator
+from internet_computer.tools.writers import CanisterWriter
+
+
+class ParallelCanisterDump:
+    DEFAULT_PARTITION_KEY = '_id'
+
+    partition_keys = ['_id', 'canister_id']
+
+    mergeable_outputs = ['csv', 'ndjson']
+
+    def __init__(
+        self,
+        pymongo_config_path,
+        environment,
+        output,
+        output_file,
+        workers,
+        fields_to_output=None,
+        compression=None,
+        batch_size=Canister.DEFAULT_BATCH_SIZE,
+        partition_key=DEFAULT_PARTITION_KEY
+    ):
+        if output_file is None:
+            raise ValueError('A parallel dump requires an output file.')
+
+        self.__pymongo_config_path = pymongo_config_path
+        self.__environment = environment
+        self.__output = output
+        self.__output_file = Path(output_file)
+        self.__workers = max(1, workers)
+        self.__fields_to_output = fields_to_output
+        self.__compression = compression
+        self.__batch_size = batch_size
+        self.__partition_key = partition_key
+
+    @property
+    def output_file(self):
+        return self.__output_file
+
+    @property
+    def workers(self):
+        return self.__workers
+
+    @property
+    def partition_key(self):
+        return self.__partition_key
+
+    @property
+    def manifest_file(self):
+        return self.output_file.with_name(self.output_file.name + '.manifest.json')
+
+    def shard_file(self, index):
+        # canisters.csv.gz becomes canisters.part-00000.csv.gz
+        name, dot, extensions = self.output_file.name.partition('.')
+        return self.output_file.with_name(f'{name}.part-{index:05d}{dot}{extensions}')
+
+    def boundaries(self):
+        database = MongoClientConfigurator(
+            config_path=self.__pymongo_config_path,
+            environment=self.__environment
+        ).from_config()
+        collection = database[Canister.collection_name]
+
+        count = collection.estimated_document_count()
+
+        # Split points are read off the partition key's index, so every
+        # worker gets a contiguous range of roughly equal size.
+        split_points = []
+        for index in range(1, self.workers):
+            found = list(
+                collection.find({}, {self.partition_key: 1})
+                .sort(self.partition_key, 1)
+                .skip(index * count // self.workers)
+                .limit(1)
+            )
+            if found and (not split_points or found[0][self.partition_key] != split_points[-1]):
+                split_points.append(found[0][self.partition_key])
+
+        return list(zip([None, *split_points], [*split_points, None]))
+
+    def tasks(self):
+        return [
+            {
+                'pymongo_config_path': self.__pymongo_config_path,
+                'environment': self.__environment,
+                'output': self.__output,
+                'output_file': str(self.shard_file(index)),
+                'fields_to_output': self.__fields_to_output,
+                'compression': self.__compression,
+                'batch_size': self.__batch_size,
+                'partition_key': self.partition_key,
+                'lower': lower,
+                'upper': upper,
+            }
+            for index, (lower, upper) in enumerate(self.boundaries())
+        ]
+
+    @staticmethod
+    def dump_partition(task):
+        Canister.set_client(
+            MongoClientConfigurator(
+                config_path=task['pymongo_config_path'],
+                environment=task['environment']
+            ).from_config()
+        )
+
+        key_range = {}
+        if task['lower'] is not None:
+            key_range['$gte'] = task['lower']
+        if task['upper'] is not None:
+            key_range['$lt'] = task['upper']
+
+        canisters = Canister.all(
+            {task['partition_key']: key_range} if key_range else None,
+            projection=Canister.projection(task['fields_to_output']),
+            sort=[(task['partition_key'], 1)],
+            batch_size=task['batch_size']
+        )
+
+        with CanisterWriter.for_output(
+            task['output'],
+            fields_to_output=task['fields_to_output'],
+            output_file=task['output_file'],
+            compression=task['compression']
+        ) as writer:
+            for canister in canisters:
+                writer.write(canister)
+
+        return {
+            'file': os.path.basename(task['output_file']),
+            'lower': None if task['lower'] is None else str(task['lower']),
+            'upper': None if task['upper'] is None else str(task['upper']),
+            'count': writer.count,
+            'bytes': os.path.getsize(task['output_file']),
+        }
+
+    def check_mergeable(self):
+        if self.__output not in self.mergeable_outputs:
+            raise ValueError(
+                f'{self.__output} shards cannot be merged; only {", ".join(self.mergeable_outputs)} can.'
+            )
+
+    def merge(self, shards):
+        self.check_mergeable()
+
+        with CanisterWriter.open_file(self.output_file, self.__compression) as merged:
+            for index, shard in enumerate(shards):
+                shard_file = self.output_file.with_name(shard['file'])
+
+                with CanisterWriter.open_file(shard_file, self.__compression, mode='rt') as stream:
+                    # Every csv shard starts with its own header; keep the first.
+                    if self.__output == 'csv' and index > 0:
+                        stream.readline()
+
+                    while chunk := stream.read(CanisterWriter.DEFAULT_BUFFER_SIZE):
+                        merged.write(chunk)
+
+                shard_file.unlink()
+
+    def dump(self, merge=False):
+        # Checked up front, rather than after every worker has finished.
+        if merge:
+            self.check_mergeable()
+
+        start_time = time.time()
+
+        tasks = self.tasks()
+
+        # Each worker opens its own MongoClient, which must not be inherited
+        # across a fork.
+        with multiprocessing.get_context('spawn').Pool(min(self.workers, len(tasks))) as pool:
+            shards = pool.map(self.dump_partition, tasks)
+
+        if merge:
+            self.merge(shards)
+
+        manifest = {
+            'output': self.__output,
+            'compression': CanisterWriter.compression_for(self.output_file, self.__compression),
+            'fields': self.__fields_to_output,
+            'partition_key': self.partition_key,
+            'count': sum(shard['count'] for shard in shards),
+            'merged_file': self.output_file.name if merge else None,
+            'shards': [] if merge else shards,
+            'started_at': start_time,
+            'finished_at': time.time(),
+        }
+
+        with open(self.manifest_file, 'w') as stream:
+            json.dump(manifest, stream, indent=2)
+
+        return manifest
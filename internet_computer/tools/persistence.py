@@ -0,0 +1,228 @@
+import asyncio
+import queue
+import threading
+import time
+
+from pymongo import UpdateOne
+
+
+class CanisterBulkWriter:
+    DEFAULT_BATCH_SIZE = 1000
+    DEFAULT_FLUSH_INTERVAL = 5
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.__batch_size = max(1, batch_size)
+        self.__flush_interval = flush_interval
+        self.__collection = None
+        self.__operations = []
+        self.__last_flush = time.monotonic()
+        self.__upserted_count = 0
+        self.__modified_count = 0
+
+    @property
+    def batch_size(self):
+        return self.__batch_size
+
+    @property
+    def flush_interval(self):
+        return self.__flush_interval
+
+    @property
+    def pending_count(self):
+        return len(self.__operations)
+
+    @property
+    def upserted_count(self):
+        return self.__upserted_count
+
+    @property
+    def modified_count(self):
+        return self.__modified_count
+
+    @staticmethod
+    def upsert_operation(canister, stale_fields=()):
+        # Unset fields are left alone so that re-fetching a canister from the
+        # API does not wipe the web status recorded by an earlier probe.
+        # Fields known to be stale are removed explicitly instead.
+        document = {
+            field: value
+            for field, value in canister.to_document().items()
+            if value is not None and field not in stale_fields
+        }
+
+        if 'module_hash' in document:
+            return UpdateOne(
+                {'canister_id': canister.canister_id},
+                CanisterBulkWriter.tracking_update(document, stale_fields),
+                upsert=True
+            )
+
+        update = {'$set': document}
+
+        if stale_fields:
+            update['$unset'] = {field: '' for field in stale_fields}
+
+        return UpdateOne(
+            {'canister_id': canister.canister_id},
+            update,
+            upsert=True
+        )
+
+    @staticmethod
+    def tracking_update(document, stale_fields=()):
+        # An update pipeline compares the incoming module_hash with the
+        # stored one server side, stamping module_hash_changed_at when an
+        # existing canister is upgraded.
+        stored_module_hash = {'$ifNull': ['$module_hash', document['module_hash']]}
+
+        update = [
+            {'$set': {
+                'module_hash_changed_at': {
+                    '$cond': [
+                        {'$ne': [stored_module_hash, {'$literal': document['module_hash']}]},
+                        {'$literal': time.time()},
+                        '$module_hash_changed_at'
+                    ]
+                }
+            }},
+            {'$set': {field: {'$literal': value} for field, value in document.items()}},
+        ]
+
+        if stale_fields:
+            update.append({'$unset': list(stale_fields)})
+
+        return update
+
+    def add(self, canister, stale_fields=()):
+        if self.__collection is None:
+            canister_class = type(canister)
+            self.__collection = canister_class.get_client()[canister_class.collection_name]
+
+        self.__operations.append(self.upsert_operation(canister, stale_fields))
+
+        if len(self.__operations) >= self.batch_size or self.flush_due():
+            self.flush()
+
+    def flush_due(self):
+        return time.monotonic() - self.__last_flush >= self.flush_interval
+
+    def flush(self):
+        self.__last_flush = time.monotonic()
+
+        if not self.__operations:
+            return
+
+        operations, self.__operations = self.__operations, []
+
+        result = self.__collection.bulk_write(operations, ordered=False)
+
+        # Unacknowledged writes (w: 0) report no counts, and reading them raises.
+        if not result.acknowledged:
+            return
+
+        self.__upserted_count += result.upserted_count
+        self.__modified_count += result.modified_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
+class ThreadedCanisterWriter:
+    DEFAULT_MAX_BACKLOG = 10000
+
+    __stop = object()
+
+    def __init__(
+        self,
+        batch_size=CanisterBulkWriter.DEFAULT_BATCH_SIZE,
+        flush_interval=CanisterBulkWriter.DEFAULT_FLUSH_INTERVAL,
+        max_backlog=DEFAULT_MAX_BACKLOG
+    ):
+        self.__bulk_writer = CanisterBulkWriter(
+            batch_size=batch_size,
+            flush_interval=flush_interval
+        )
+        # Bounded, so a slow Mongo pushes back on producers instead of
+        # letting probed canisters pile up in memory.
+        self.__queue = queue.Queue(maxsize=max_backlog)
+        self.__error = None
+        self.__thread = threading.Thread(
+            target=self.__run,
+            name='canister-writer',
+            daemon=True
+        )
+        self.__thread.start()
+
+    @property
+    def bulk_writer(self):
+        return self.__bulk_writer
+
+    @property
+    def backlog(self):
+        return self.__queue.qsize()
+
+    def put(self, canister, stale_fields=()):
+        self.__raise_error()
+        self.__queue.put((canister, stale_fields))
+
+    async def put_async(self, canister, stale_fields=()):
+        self.__raise_error()
+
+        try:
+            self.__queue.put_nowait((canister, stale_fields))
+        except queue.Full:
+            # Wait for room off the event loop, so probes keep running.
+            await asyncio.get_running_loop().run_in_executor(None, self.put, canister, stale_fields)
+
+    def flush(self):
+        flushed = threading.Event()
+        self.__queue.put(flushed)
+        flushed.wait()
+        self.__raise_error()
+
+    def close(self):
+        if self.__thread.is_alive():
+            self.__queue.put(self.__stop)
+            self.__thread.join()
+
+        self.__raise_error()
+
+    def __raise_error(self):
+        if self.__error is not None:
+            raise self.__error
+
+    def __run(self):
+        bulk_writer = self.bulk_writer
+
+        while True:
+            try:
+                item = self.__queue.get(timeout=bulk_writer.flush_interval)
+            except queue.Empty:
+                item = None
+
+            if item is self.__stop:
+                self.__guard(bulk_writer.flush)
+                return
+
+            if isinstance(item, threading.Event):
+                self.__guard(bulk_writer.flush)
+                item.set()
+            elif item is not None:
+                self.__guard(bulk_writer.add, *item)
+            elif bulk_writer.flush_due():
+                self.__guard(bulk_writer.flush)
+
+    def __guard(self, operation, *args):
+        try:
+            operation(*args)
+        except Exception as error:
+            self.__error = error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,238 @@
+import asyncio
+import time
+from contextlib import aclosing
+
+from internet_computer.tools.probe import CanisterProbe
+
+
+class CanisterPipeline:
+    DEFAULT_PROBE_CONCURRENCY = 64
+    DEFAULT_QUEUE_SIZE = 1024
+
+    __done = object()
+
+    def __init__(
+        self,
+        data_fetcher,
+        emit=None,
+        probe=None,
+        writer=None,
+        probe_concurrency=DEFAULT_PROBE_CONCURRENCY,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        maximum_canister_count=None,
+        maximum_time_limit=None,
+        checkpoint=None,
+        known=None
+    ):
+        if checkpoint is not None and not data_fetcher.ordered:
+            raise ValueError('Checkpoints require canisters to be fetched in order.')
+
+        self.__data_fetcher = data_fetcher
+        self.__emit = emit
+        self.__probe = probe
+        self.__writer = writer
+        self.__probe_concurrency = max(1, probe_concurrency) if probe is not None else 1
+        self.__queue_size = queue_size
+        self.__maximum_canister_count = maximum_canister_count
+        self.__maximum_time_limit = maximum_time_limit
+        self.__checkpoint = checkpoint
+        self.__known = known
+        self.__resume_offset = data_fetcher.offset
+        self.__fetched_count = 0
+        self.__emitted_count = 0
+        self.__skipped_count = 0
+
+    @property
+    def data_fetcher(self):
+        return self.__data_fetcher
+
+    @property
+    def probe(self):
+        return self.__probe
+
+    @property
+    def writer(self):
+        return self.__writer
+
+    @property
+    def checkpoint(self):
+        return self.__checkpoint
+
+    @property
+    def resume_offset(self):
+        return self.__resume_offset
+
+    @property
+    def probe_concurrency(self):
+        return self.__probe_concurrency
+
+    @property
+    def fetched_count(self):
+        return self.__fetched_count
+
+    @property
+    def emitted_count(self):
+        return self.__emitted_count
+
+    @property
+    def skipped_count(self):
+        return self.__skipped_count
+
+    async def run(self):
+        probe_queue = asyncio.Queue(maxsize=self.__queue_size)
+        store_queue = asyncio.Queue(maxsize=self.__queue_size)
+        output_queue = asyncio.Queue(maxsize=self.__queue_size)
+
+        tasks = [
+            asyncio.create_task(self.__fetch_stage(probe_queue)),
+            *[
+                asyncio.create_task(self.__probe_stage(probe_queue, store_queue))
+                for _ in range(self.probe_concurrency)
+            ],
+            asyncio.create_task(self.__store_stage(store_queue, output_queue)),
+            asyncio.create_task(self.__output_stage(output_queue)),
+        ]
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        if self.checkpoint is not None:
+            await self.__save_checkpoint()
+
+        return self.emitted_count
+
+    def __limit_reached(self, start_time):
+        if self.__maximum_canister_count is not None \
+                and self.__fetched_count >= self.__maximum_canister_count:
+            return True
+
+        if self.__maximum_time_limit is not None \
+                and time.monotonic() - start_time >= self.__maximum_time_limit:
+            return True
+
+        return False
+
+    async def __fetch_stage(self, probe_queue):
+        start_time = time.monotonic()
+
+        limit_reached = self.__limit_reached(start_time)
+
+        if not limit_reached:
+            async with aclosing(self.data_fetcher.fetch_pages_async()) as pages:
+                async for offset, canisters in pages:
+                    for index, canister in enumerate(canisters, start=1):
+                        # The last canister of a page carries the offset to
+                        # resume from once it has been emitted.
+                        next_offset = offset + self.data_fetcher.limit if index == len(canisters) else None
+
+                        # Canisters stored with the same content are neither
+                        # probed nor written again.
+                        unchanged = self.__known is not None and self.__known.unchanged(canister)
+
+                        await probe_queue.put((self.__fetched_count, canister, next_offset, unchanged))
+                        self.__fetched_count += 1
+
+                        limit_reached = self.__limit_reached(start_time)
+                        if limit_reached:
+                            break
+
+                    if limit_reached:
+                        break
+
+        for _ in range(self.probe_concurrency):
+            await probe_queue.put(self.__done)
+
+    async def __probe_stage(self, probe_queue, store_queue):
+        while True:
+            item = await probe_queue.get()
+
+            if item is not self.__done and self.probe is not None and not item[3]:
+                try:
+                    await item[1].verify_web_canister_async(self.probe)
+                except CanisterProbe.failures:
+                    pass
+
+            await store_queue.put(item)
+
+            if item is self.__done:
+                return
+
+    async def __store_stage(self, store_queue, output_queue):
+        remaining_probes = self.probe_concurrency
+
+        while remaining_probes:
+            item = await store_queue.get()
+
+            if item is self.__done:
+                remaining_probes -= 1
+                continue
+
+            if item[3]:
+                self.__skipped_count += 1
+            elif self.writer is not None:
+                await self.writer.put_async(item[1])
+
+            await output_queue.put(item)
+
+        await output_queue.put(self.__done)
+
+    async def __output_stage(self, output_queue):
+        # Probes finish out of order, so ordered output holds completed
+        # canisters back until every canister before them has been emitted.
+        pending = {}
+        next_sequence = 0
+
+        while True:
+            item = await output_queue.get()
+
+            if item is self.__done:
+                break
+
+            if not self.data_fetcher.ordered:
+                self.__output(item)
+                continue
+
+            pending[item[0]] = item
+
+            while next_sequence in pending:
+                self.__output(pending.pop(next_sequence))
+                next_sequence += 1
+
+            if self.checkpoint is not None and self.checkpoint.save_due():
+                await self.__save_checkpoint()
+
+        for sequence in sorted(pending):
+            self.__output(pending.pop(sequence))
+
+    def __output(self, item):
+        _, canister, next_offset, unchanged = item
+
+        if next_offset is not None:
+            self.__resume_offset = next_offset
+
+        # Unchanged canisters are not probed, so with a probe they would be
+        # output without their web status; they only advance the offset.
+        if unchanged and self.probe is not None:
+            return
+
+        if self.__emit is not None:
+            self.__emit(canister)
+
+        self.__emitted_count += 1
+
+    async def __save_checkpoint(self):
+        state = {'offset': self.resume_offset}
+
+        loop = asyncio.get_running_loop()
+
+        # Everything up to the resume offset must be durable before the
+        # checkpoint claims it.
+        if self.writer is not None:
+            await loop.run_in_executor(None, self.writer.flush)
+
+        await loop.run_in_executor(None, self.checkpoint.save, state)
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+
+import aiohttp
+
+from internet_computer.tools.throttle import EndpointOverloadedError, EndpointThrottle
+
+
+class CanisterProbe:
+    DEFAULT_METHOD = 'GET'
+    DEFAULT_CONNECT_TIMEOUT = 5
+    DEFAULT_READ_TIMEOUT = 10
+    DEFAULT_CONNECTION_LIMIT = 1024
+    DEFAULT_CONNECTION_LIMIT_PER_HOST = 8
+    DEFAULT_DNS_CACHE_TTL = 300
+    DEFAULT_KEEPALIVE_TIMEOUT = 30
+
+    methods = ['GET', 'HEAD']
+
+    failures = (aiohttp.ClientError, asyncio.TimeoutError, EndpointOverloadedError)
+
+    def __init__(
+        self,
+        method=DEFAULT_METHOD,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        connection_limit=DEFAULT_CONNECTION_LIMIT,
+        connection_limit_per_host=DEFAULT_CONNECTION_LIMIT_PER_HOST,
+        dns_cache_ttl=DEFAULT_DNS_CACHE_TTL,
+        keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT,
+        rate=None,
+        attempts=EndpointThrottle.DEFAULT_ATTEMPTS,
+        throttle=None
+    ):
+        if method not in self.methods:
+            raise ValueError(f'Unsupported probe method: {method}')
+
+        self.__method = method
+        self.__connect_timeout = connect_timeout
+        self.__read_timeout = read_timeout
+        self.__connection_limit = connection_limit
+        self.__connection_limit_per_host = connection_limit_per_host
+        self.__dns_cache_ttl = dns_cache_ttl
+        self.__keepalive_timeout = keepalive_timeout
+        # Probes start at full concurrency, as web_status always ran, and
+        # only back off on 429/503: a timeout or refused connection is that
+        # canister's own answer, not overload of the boundary nodes.
+        self.__throttle = throttle if throttle is not None else EndpointThrottle(
+            'web_probe',
+            initial_concurrency=connection_limit,
+            maximum_concurrency=connection_limit,
+            rate=rate,
+            attempts=attempts,
+            failures_are_overload=False
+        )
+        self.__session = None
+
+    @property
+    def method(self):
+        return self.__method
+
+    @property
+    def connect_timeout(self):
+        return self.__connect_timeout
+
+    @property
+    def read_timeout(self):
+        return self.__read_timeout
+
+    @property
+    def throttle(self):
+        return self.__throttle
+
+    def session(self) -> aiohttp.ClientSession:
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.__connection_limit,
+                limit_per_host=self.__connection_limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.__dns_cache_ttl,
+                keepalive_timeout=self.__keepalive_timeout
+            )
+
+            self.__session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    sock_connect=self.connect_timeout,
+                    sock_read=self.read_timeout
+                )
+            )
+
+        return self.__session
+
+    async def __request(self, url):
+        async with self.session().request(self.method, url) as resp:
+            # Only the status line matters. Every probe goes to a different
+            # canister host, so a pooled connection would never be reused;
+            # releasing the unread body closes it without downloading the page.
+            resp.release()
+
+            return resp.status, resp.status
+
+    async def status(self, url):
+        # Overload responses are retried and never returned, so they are not
+        # recorded as a canister's status.
+        return await self.throttle.request(lambda: self.__request(url))
+
+    async def close(self):
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class SyncCanisterProbe:
+    __shared = None
+
+    __shared_lock = threading.Lock()
+
+    def __init__(self, probe=None):
+        self.__probe = probe if probe is not None else CanisterProbe()
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(
+            target=self.__loop.run_forever,
+            name='canister-probe',
+            daemon=True
+        )
+        self.__thread.start()
+
+    @property
+    def probe(self):
+        return self.__probe
+
+    def status(self, url):
+        return asyncio.run_coroutine_threadsafe(
+            self.probe.status(url),
+            self.__loop
+        ).result()
+
+    def close(self):
+        if self.__loop.is_closed():
+            return
+
+        asyncio.run_coroutine_threadsafe(self.probe.close(), self.__loop).result()
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+        self.__loop.close()
+
+    @classmethod
+    def shared(cls):
+        with cls.__shared_lock:
+            if cls.__shared is None:
+                cls.__shared = cls()
+
+            return cls.__shared
@@ -1,3 +1,6 @@
+import os
+import threading
+
 import pymongo
 import yaml
 from pymongo.database import Database
@@ -6,6 +9,50 @@ from pymongo.database import Database
 class MongoClientConfigurator:
     DEFAULT_ENVIRONMENT = 'development'
 
+    # Options under clients.default.options in pymongo.yml that are passed on
+    # to MongoClient, keyed by their (Mongoid-style) config name. Durations
+    # in the config are in seconds, as they are for Mongoid.
+    client_option_names = {
+        'app_name': 'appname',
+        'auth_source': 'authSource',
+        'direct_connection': 'directConnection',
+        'max_pool_size': 'maxPoolSize',
+        'min_pool_size': 'minPoolSize',
+        'max_connecting': 'maxConnecting',
+        'password': 'password',
+        'replica_set': 'replicaSet',
+        'retry_reads': 'retryReads',
+        'retry_writes': 'retryWrites',
+        'ssl': 'tls',
+        'tls': 'tls',
+        'user': 'username',
+        'zlib_compression_level': 'zlibCompressionLevel',
+    }
+
+    client_duration_option_names = {
+        'connect_timeout': 'connectTimeoutMS',
+        'heartbeat_frequency': 'heartbeatFrequencyMS',
+        'local_threshold': 'localThresholdMS',
+        'max_idle_time': 'maxIdleTimeMS',
+        'server_selection_timeout': 'serverSelectionTimeoutMS',
+        'socket_timeout': 'socketTimeoutMS',
+        'wait_queue_timeout': 'waitQueueTimeoutMS',
+    }
+
+    auth_mechanisms = {
+        'aws': 'MONGODB-AWS',
+        'gssapi': 'GSSAPI',
+        'mongodb_cr': 'MONGODB-CR',
+        'mongodb_x509': 'MONGODB-X509',
+        'plain': 'PLAIN',
+        'scram': 'SCRAM-SHA-1',
+        'scram256': 'SCRAM-SHA-256',
+    }
+
+    __clients = {}
+
+    __clients_lock = threading.Lock()
+
     def __init__(self, config_path, environment=DEFAULT_ENVIRONMENT):
         self.__config_path = config_path
         self.__environment = environment
@@ -18,18 +65,96 @@ class MongoClientConfigurator:
     def environment(self):
         return self.__environment
 
-    def from_config(self) -> Database:
+    @staticmethod
+    def symbol(value):
+        # Mongoid configs write enumerations as Ruby symbols (:secondary).
+        return str(value).lstrip(':')
+
+    @classmethod
+    def client_options(cls, options):
+        options = options or {}
+        client_options = {}
+
+        for name, option_name in cls.client_option_names.items():
+            if name in options:
+                client_options[option_name] = options[name]
+
+        for name, option_name in cls.client_duration_option_names.items():
+            if options.get(name) is not None:
+                client_options[option_name] = int(options[name] * 1000)
+
+        if 'auth_mech' in options:
+            auth_mech = cls.symbol(options['auth_mech'])
+            client_options['authMechanism'] = cls.auth_mechanisms.get(auth_mech, auth_mech)
+
+        if 'compressors' in options:
+            compressors = options['compressors']
+            if not isinstance(compressors, str):
+                compressors = ','.join(cls.symbol(compressor) for compressor in compressors)
+            client_options['compressors'] = compressors
+
+        write = options.get('write') or {}
+        for name, option_name in [('w', 'w'), ('j', 'journal'), ('fsync', 'fsync')]:
+            if name in write:
+                client_options[option_name] = write[name]
+        if 'wtimeout' in write:
+            client_options['wTimeoutMS'] = int(write['wtimeout'] * 1000)
+
+        read = options.get('read') or {}
+        if 'mode' in read:
+            first, *rest = cls.symbol(read['mode']).split('_')
+            client_options['readPreference'] = first + ''.join(part.title() for part in rest)
+        if read.get('tag_sets'):
+            client_options['readPreferenceTags'] = [
+                ','.join(f'{key}:{value}' for key, value in tag_set.items())
+                for tag_set in read['tag_sets']
+            ]
+
+        return client_options
+
+    def load_config(self):
         with open(self.config_path, 'r') as stream:
-            try:
-                parsed_yaml = yaml.safe_load(stream)
-                environment_config = parsed_yaml[self.environment]
-                default_client = environment_config['clients']['default']
-                mongo_client = pymongo.MongoClient(
-                    host=default_client['hosts']
-                )
-
-                return mongo_client[default_client['database']]
-
-            except yaml.YAMLError as error:
-                # TODO: check for logger and log error
-                raise
+            parsed_yaml = yaml.safe_load(stream)
+
+        return parsed_yaml[self.environment]['clients']['default']
+
+    def build_client(self, default_client) -> pymongo.MongoClient:
+        client_options = self.client_options(default_client.get('options'))
+
+        if 'uri' in default_client:
+            return pymongo.MongoClient(default_client['uri'], **client_options)
+
+        return pymongo.MongoClient(
+            host=default_client['hosts'],
+            **client_options
+        )
+
+    def from_config(self) -> Database:
+        try:
+            default_client = self.load_config()
+        except yaml.YAMLError as error:
+            # TODO: check for logger and log error
+            raise
+
+        # One client per config and environment, so that every command in a
+        # process shares the same connection pool.
+        cache_key = (os.path.realpath(self.config_path), self.environment)
+
+        with type(self).__clients_lock:
+            mongo_client = type(self).__clients.get(cache_key)
+
+            if mongo_client is None:
+                mongo_client = type(self).__clients[cache_key] = self.build_client(default_client)
+
+        if 'database' in default_client:
+            return mongo_client[default_client['database']]
+
+        return mongo_client.get_default_database()
+
+    @classmethod
+    def close_clients(cls):
+        with cls.__clients_lock:
+            for mongo_client in cls.__clients.values():
+                mongo_client.close()
+
+            cls.__clients.clear()
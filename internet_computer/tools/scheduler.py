@@ -0,0 +1,44 @@
+import time
+
+
+class CanisterProbeScheduler:
+    DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE):
+        self.__max_age = max_age
+
+    @property
+    def max_age(self):
+        return self.__max_age
+
+    def tiers(self, now=None):
+        if now is None:
+            now = time.time()
+
+        stale_before = now - self.max_age
+
+        # The tiers are disjoint, so a canister is probed at most once per run.
+        return [
+            (
+                'never_checked',
+                {'last_probed_at': None, 'last_status_code': None},
+                [('_id', 1)]
+            ),
+            (
+                'stalest',
+                {'$or': [
+                    {'last_probed_at': {'$lt': stale_before}},
+                    # Checked before probe times were recorded.
+                    {'last_probed_at': None, 'last_status_code': {'$ne': None}},
+                ]},
+                [('last_probed_at', 1)]
+            ),
+            (
+                'module_hash_changed',
+                {
+                    'last_probed_at': {'$gte': stale_before},
+                    '$expr': {'$gt': ['$module_hash_changed_at', '$last_probed_at']},
+                },
+                [('module_hash_changed_at', -1)]
+            ),
+        ]
@@ -0,0 +1,342 @@
+import math
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from pathlib import Path
+
+from internet_computer.tools.inventory import Canister
+
+
+class CanisterSnapshotFormat:
+    magic = b'ICSNAP\x00\x00'
+
+    version = 1
+
+    # magic, version, record count, string count, then the offsets of the
+    # string offsets, string data, controllers and records sections.
+    header = struct.Struct('<8sIIQQQQQ')
+
+    # canister_id, subnet_id and module_hash string ids, the first controller
+    # and the controller count, last_status_code, is_web_canister,
+    # last_probed_at and module_hash_changed_at.
+    record = struct.Struct('<IIIIIHBxdd')
+
+    string_offset = struct.Struct('<Q')
+
+    string_id = struct.Struct('<I')
+
+    none = 0xFFFFFFFF
+
+    web_canister_values = {None: 2, False: 0, True: 1}
+
+
+class CanisterSnapshotWriter(CanisterSnapshotFormat):
+    DEFAULT_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.__path = Path(path)
+        # Records and controllers are spooled to disk as they arrive, under
+        # provisional string ids; only the string table is held in memory.
+        self.__strings = {}
+        self.__records = tempfile.TemporaryFile(dir=self.__path.parent)
+        self.__controllers = tempfile.TemporaryFile(dir=self.__path.parent)
+        self.__count = 0
+        self.__controller_count = 0
+        self.__last_canister_id = None
+        self.__ordered = True
+
+    @property
+    def path(self):
+        return self.__path
+
+    @property
+    def count(self):
+        return self.__count
+
+    def __provisional_id(self, value):
+        if value is None:
+            return self.none
+
+        return self.__strings.setdefault(value, len(self.__strings))
+
+    def add(self, canister):
+        if self.__last_canister_id is not None and canister.canister_id <= self.__last_canister_id:
+            self.__ordered = False
+        self.__last_canister_id = canister.canister_id
+
+        controllers = canister.controllers
+        for controller in controllers or ():
+            self.__controllers.write(self.string_id.pack(self.__provisional_id(controller)))
+
+        self.__records.write(self.record.pack(
+            self.__provisional_id(canister.canister_id),
+            self.__provisional_id(canister.subnet_id),
+            self.__provisional_id(canister.module_hash),
+            self.__controller_count,
+            self.none if controllers is None else len(controllers),
+            canister.last_status_code or 0,
+            self.web_canister_values[canister.is_web_canister],
+            math.nan if canister.last_probed_at is None else canister.last_probed_at,
+            math.nan if canister.module_hash_changed_at is None else canister.module_hash_changed_at
+        ))
+
+        self.__controller_count += len(controllers or ())
+        self.__count += 1
+
+    def __positions(self, records, final_ids):
+        if self.__ordered:
+            return range(self.__count)
+
+        # Unordered sources, such as the API, are put in canister_id order
+        # with one int per canister: final id in the high bits, spool
+        # position in the low bits. A canister added twice keeps its last
+        # record.
+        keys = array('Q', sorted(
+            final_ids[self.string_id.unpack_from(records, self.record.size * position)[0]] << 32 | position
+            for position in range(self.__count)
+        ))
+
+        positions = array('I')
+        for index, key in enumerate(keys):
+            if index + 1 < len(keys) and keys[index + 1] >> 32 == key >> 32:
+                continue
+            positions.append(key & 0xFFFFFFFF)
+
+        return positions
+
+    def close(self):
+        # Sorted strings make string ids follow canister_id order, so both
+        # tables can be binary searched.
+        strings = sorted(self.__strings)
+        final_ids = array('I', bytes(self.string_id.size * len(strings)))
+        for final_id, string in enumerate(strings):
+            final_ids[self.__strings[string]] = final_id
+        self.__strings = {}
+
+        def final_id_of(provisional_id):
+            return self.none if provisional_id == self.none else final_ids[provisional_id]
+
+        self.__records.flush()
+        records = mmap.mmap(self.__records.fileno(), 0, access=mmap.ACCESS_READ) if self.__count else b''
+
+        positions = self.__positions(records, final_ids)
+
+        string_offsets_at = self.header.size
+        string_data_at = string_offsets_at + self.string_offset.size * (len(strings) + 1)
+        controllers_at = string_data_at + sum(len(string.encode()) for string in strings)
+        records_at = controllers_at + self.string_id.size * self.__controller_count
+
+        temporary_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temporary_path, 'wb') as stream:
+            stream.write(self.header.pack(
+                self.magic,
+                self.version,
+                len(positions),
+                len(strings),
+                string_offsets_at,
+                string_data_at,
+                controllers_at,
+                records_at
+            ))
+
+            offset = 0
+            for string in strings:
+                stream.write(self.string_offset.pack(offset))
+                offset += len(string.encode())
+            stream.write(self.string_offset.pack(offset))
+
+            for string in strings:
+                stream.write(string.encode())
+
+            self.__controllers.seek(0)
+            while chunk := self.__controllers.read(self.DEFAULT_CHUNK_SIZE):
+                controllers = array('I')
+                controllers.frombytes(chunk)
+                stream.write(array('I', (final_ids[controller] for controller in controllers)).tobytes())
+
+            for position in positions:
+                canister_id, subnet_id, module_hash, *fields = self.record.unpack_from(
+                    records,
+                    self.record.size * position
+                )
+                stream.write(self.record.pack(
+                    final_ids[canister_id],
+                    final_id_of(subnet_id),
+                    final_id_of(module_hash),
+                    *fields
+                ))
+
+        if self.__count:
+            records.close()
+
+        os.replace(temporary_path, self.path)
+
+        self.__count = len(positions)
+        self.__discard()
+
+    def __discard(self):
+        self.__records.close()
+        self.__controllers.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.__discard()
+
+
+class CanisterSnapshot(CanisterSnapshotFormat):
+    def __init__(self, path):
+        self.__path = Path(path)
+
+        with open(self.__path, 'rb') as stream:
+            self.__map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            version,
+            self.__record_count,
+            self.__string_count,
+            self.__string_offsets_at,
+            self.__string_data_at,
+            self.__controllers_at,
+            self.__records_at
+        ) = self.header.unpack_from(self.__map, 0)
+
+        if magic != self.magic or version != self.version:
+            self.close()
+            raise ValueError(f'{path} is not a version {self.version} canister snapshot.')
+
+    @property
+    def path(self):
+        return self.__path
+
+    def __len__(self):
+        return self.__record_count
+
+    def string(self, string_id):
+        if string_id == self.none:
+            return None
+
+        start, end = struct.unpack_from(
+            '<QQ',
+            self.__map,
+            self.__string_offsets_at + self.string_offset.size * string_id
+        )
+
+        return str(self.__map[self.__string_data_at + start:self.__string_data_at + end], 'utf-8')
+
+    def string_id_of(self, value):
+        encoded = value.encode()
+        low, high = 0, self.__string_count
+
+        while low < high:
+            middle = (low + high) // 2
+            start, end = struct.unpack_from(
+                '<QQ',
+                self.__map,
+                self.__string_offsets_at + self.string_offset.size * middle
+            )
+            candidate = self.__map[self.__string_data_at + start:self.__string_data_at + end]
+
+            if candidate < encoded:
+                low = middle + 1
+            elif candidate > encoded:
+                high = middle
+            else:
+                return middle
+
+        return None
+
+    def __record_id(self, position):
+        return self.string_id.unpack_from(self.__map, self.__records_at + self.record.size * position)[0]
+
+    def position_of(self, canister_id):
+        string_id = self.string_id_of(canister_id)
+        if string_id is None:
+            return None
+
+        low, high = 0, self.__record_count
+        while low < high:
+            middle = (low + high) // 2
+            record_id = self.__record_id(middle)
+
+            if record_id < string_id:
+                low = middle + 1
+            elif record_id > string_id:
+                high = middle
+            else:
+                return middle
+
+        return None
+
+    def canister_at(self, position):
+        (
+            canister_id,
+            subnet_id,
+            module_hash,
+            first_controller,
+            controller_count,
+            last_status_code,
+            is_web_canister,
+            last_probed_at,
+            module_hash_changed_at
+        ) = self.record.unpack_from(self.__map, self.__records_at + self.record.size * position)
+
+        controllers = None
+        if controller_count != self.none:
+            controllers = [
+                self.string(controller)
+                for controller in struct.unpack_from(
+                    f'<{controller_count}I',
+                    self.__map,
+                    self.__controllers_at + self.string_id.size * first_controller
+                )
+            ]
+
+        return Canister(
+            canister_id=self.string(canister_id),
+            controllers=controllers,
+            module_hash=self.string(module_hash),
+            subnet_id=self.string(subnet_id),
+            last_status_code=last_status_code or None,
+            is_web_canister=None if is_web_canister == 2 else bool(is_web_canister),
+            last_probed_at=None if math.isnan(last_probed_at) else last_probed_at,
+            module_hash_changed_at=None if math.isnan(module_hash_changed_at) else module_hash_changed_at
+        )
+
+    def get(self, canister_id):
+        position = self.position_of(canister_id)
+        return None if position is None else self.canister_at(position)
+
+    def __contains__(self, canister_id):
+        return self.position_of(canister_id) is not None
+
+    def __iter__(self):
+        for position in range(self.__record_count):
+            yield self.canister_at(position)
+
+    def by_subnet(self, subnet_id):
+        string_id = self.string_id_of(subnet_id)
+        if string_id is None:
+            return
+
+        # Only the subnet column is read until a record matches.
+        subnet_at = self.__records_at + self.string_id.size
+        for position in range(self.__record_count):
+            if self.string_id.unpack_from(self.__map, subnet_at + self.record.size * position)[0] == string_id:
+                yield self.canister_at(position)
+
+    def close(self):
+        self.__map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
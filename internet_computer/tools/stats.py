@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+from pymongo.database import Database
+
+from internet_computer.tools.inventory import Canister
+
+
+class CanisterStatistics:
+    DEFAULT_LIMIT = 100
+
+    reports = ['subnets', 'module_hashes', 'web_ratio', 'controller_fanout']
+
+    report_fields = {
+        'subnets': ['subnet_id', 'canisters'],
+        'module_hashes': ['module_hash', 'canisters', 'subnets'],
+        'web_ratio': ['subnet_id', 'canisters', 'checked', 'web_canisters', 'web_ratio'],
+        'controller_fanout': ['controller', 'canisters'],
+    }
+
+    # Grouping on subnet_id alone is answered from its index without
+    # fetching documents. module_hashes also reads subnet_id, which
+    # module_hash's index does not cover, so it is left to the planner.
+    report_hints = {
+        'subnets': [('subnet_id', 1)],
+    }
+
+    def __init__(self, client: Database, limit=DEFAULT_LIMIT):
+        self.__client = client
+        self.__limit = limit
+
+    @property
+    def collection(self):
+        return self.__client[Canister.collection_name]
+
+    @property
+    def limit(self):
+        return self.__limit
+
+    def pipeline(self, report):
+        match report:
+            case 'subnets':
+                stages = [
+                    {'$group': {'_id': '$subnet_id', 'canisters': {'$sum': 1}}},
+                    {'$sort': {'canisters': -1, '_id': 1}},
+                    {'$project': {'_id': 0, 'subnet_id': '$_id', 'canisters': 1}},
+                ]
+            case 'module_hashes':
+                stages = [
+                    {'$match': {'module_hash': {'$ne': None}}},
+                    {'$group': {
+                        '_id': '$module_hash',
+                        'canisters': {'$sum': 1},
+                        'subnets': {'$addToSet': '$subnet_id'},
+                    }},
+                    {'$sort': {'canisters': -1, '_id': 1}},
+                    {'$project': {'_id': 0, 'module_hash': '$_id', 'canisters': 1, 'subnets': {'$size': '$subnets'}}},
+                ]
+            case 'web_ratio':
+                stages = [
+                    {'$group': {
+                        '_id': '$subnet_id',
+                        'canisters': {'$sum': 1},
+                        'checked': {'$sum': {'$cond': [{'$ifNull': ['$last_status_code', False]}, 1, 0]}},
+                        'web_canisters': {'$sum': {'$cond': [{'$eq': ['$is_web_canister', True]}, 1, 0]}},
+                    }},
+                    {'$sort': {'canisters': -1, '_id': 1}},
+                    {'$project': {
+                        '_id': 0,
+                        'subnet_id': '$_id',
+                        'canisters': 1,
+                        'checked': 1,
+                        'web_canisters': 1,
+                        # Only probed canisters count towards the ratio.
+                        'web_ratio': {'$cond': [
+                            {'$gt': ['$checked', 0]},
+                            {'$divide': ['$web_canisters', '$checked']},
+                            None
+                        ]},
+                    }},
+                ]
+            case 'controller_fanout':
+                stages = [
+                    {'$project': {'_id': 0, 'controllers': 1}},
+                    {'$unwind': '$controllers'},
+                    {'$group': {'_id': '$controllers', 'canisters': {'$sum': 1}}},
+                    {'$sort': {'canisters': -1, '_id': 1}},
+                    {'$project': {'_id': 0, 'controller': '$_id', 'canisters': 1}},
+                ]
+            case _:
+                raise ValueError(f'Unknown report: {report}')
+
+        # A limit right behind the sort lets the server keep only the top rows.
+        if self.limit:
+            sort_index = next(index for index, stage in enumerate(stages) if '$sort' in stage)
+            stages.insert(sort_index + 1, {'$limit': self.limit})
+
+        return stages
+
+    def run(self, report):
+        options = {'allowDiskUse': True}
+        if report in self.report_hints:
+            options['hint'] = self.report_hints[report]
+
+        for row in self.collection.aggregate(self.pipeline(report), **options):
+            yield SimpleNamespace(**row)
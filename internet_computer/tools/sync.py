@@ -0,0 +1,142 @@
+import asyncio
+from contextlib import aclosing
+
+from internet_computer.tools.probe import CanisterProbe
+
+
+class CanisterDeltaSync:
+    compared_fields = ('module_hash', 'controllers')
+
+    web_status_fields = ('last_status_code', 'is_web_canister')
+
+    def __init__(self, data_fetcher, writer, state, probe=None, rescan=False):
+        self.__data_fetcher = data_fetcher
+        self.__writer = writer
+        self.__state = state
+        self.__probe = probe
+        self.__rescan = rescan
+        self.__inserted_count = 0
+        self.__updated_count = 0
+        self.__unchanged_count = 0
+
+    @property
+    def data_fetcher(self):
+        return self.__data_fetcher
+
+    @property
+    def writer(self):
+        return self.__writer
+
+    @property
+    def state(self):
+        return self.__state
+
+    @property
+    def probe(self):
+        return self.__probe
+
+    @property
+    def rescan(self):
+        return self.__rescan
+
+    @property
+    def inserted_count(self):
+        return self.__inserted_count
+
+    @property
+    def updated_count(self):
+        return self.__updated_count
+
+    @property
+    def unchanged_count(self):
+        return self.__unchanged_count
+
+    @classmethod
+    def stored(cls, canisters):
+        if not canisters:
+            return {}
+
+        canister_class = type(canisters[0])
+        collection = canister_class.get_client()[canister_class.collection_name]
+
+        return {
+            document['canister_id']: document
+            for document in collection.find(
+                {'canister_id': {'$in': [canister.canister_id for canister in canisters]}},
+                {field: 1 for field in ('canister_id', *cls.compared_fields)}
+            )
+        }
+
+    @classmethod
+    def changed(cls, canister, document):
+        return canister.module_hash != document.get('module_hash') \
+            or sorted(canister.controllers or []) != sorted(document.get('controllers') or [])
+
+    async def __verify(self, canister):
+        try:
+            await canister.verify_web_canister_async(self.probe)
+            return True
+        except CanisterProbe.failures:
+            return False
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+
+        known_state = await loop.run_in_executor(None, self.state.load) or {}
+        known_max_index = known_state.get('max_canister_index')
+
+        # Only the range past the last synced index is new. The known range
+        # is compared against what is stored only when a rescan is asked for.
+        if known_max_index is not None and not self.rescan:
+            self.data_fetcher.offset = known_max_index + 1
+
+        async with aclosing(self.data_fetcher.fetch_pages_async()) as pages:
+            async for _, canisters in pages:
+                stored = await loop.run_in_executor(None, self.stored, canisters)
+
+                inserted = []
+                updated = []
+
+                for canister in canisters:
+                    document = stored.get(canister.canister_id)
+
+                    if document is None:
+                        inserted.append(canister)
+                    elif self.changed(canister, document):
+                        updated.append(canister)
+                    else:
+                        self.__unchanged_count += 1
+
+                self.__inserted_count += len(inserted)
+                self.__updated_count += len(updated)
+
+                verified = [False] * len(updated)
+                if self.probe is not None:
+                    results = await asyncio.gather(
+                        *[self.__verify(canister) for canister in inserted + updated]
+                    )
+                    verified = results[len(inserted):]
+
+                for canister in inserted:
+                    await self.writer.put_async(canister)
+
+                # A changed canister's previous web status no longer applies;
+                # clearing it queues the canister for the next web_status run.
+                for canister, is_verified in zip(updated, verified):
+                    await self.writer.put_async(canister, () if is_verified else self.web_status_fields)
+
+        max_canister_index = self.data_fetcher.max_canister_index
+
+        if max_canister_index is not None:
+            await loop.run_in_executor(None, self.writer.flush)
+            await loop.run_in_executor(
+                None,
+                self.state.save,
+                {'max_canister_index': max(max_canister_index, known_max_index or 0)}
+            )
+
+        return {
+            'inserted': self.inserted_count,
+            'updated': self.updated_count,
+            'unchanged': self.unchanged_count
+        }
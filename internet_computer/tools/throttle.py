@@ -0,0 +1,195 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+import aiohttp
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError('A token bucket needs a positive rate.')
+
+        self.__rate = rate
+        self.__capacity = capacity if capacity is not None else max(1, rate)
+        self.__tokens = self.__capacity
+        self.__updated = time.monotonic()
+        self.__lock = asyncio.Lock()
+
+    @property
+    def rate(self):
+        return self.__rate
+
+    @property
+    def capacity(self):
+        return self.__capacity
+
+    def __refill(self):
+        now = time.monotonic()
+        self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+        self.__updated = now
+
+    async def acquire(self, tokens=1):
+        # Waiters queue on the lock, so tokens are handed out first come,
+        # first served.
+        async with self.__lock:
+            while True:
+                self.__refill()
+
+                if self.__tokens >= tokens:
+                    self.__tokens -= tokens
+                    return
+
+                await asyncio.sleep((tokens - self.__tokens) / self.rate)
+
+
+class EndpointOverloadedError(Exception):
+    def __init__(self, endpoint, status):
+        super().__init__(f'{endpoint} is still overloaded (HTTP {status}) after retrying.')
+        self.endpoint = endpoint
+        self.status = status
+
+
+class EndpointThrottle:
+    DEFAULT_INITIAL_CONCURRENCY = 8
+    DEFAULT_MAXIMUM_CONCURRENCY = 1024
+    DEFAULT_DECREASE_FACTOR = 0.5
+    DEFAULT_ATTEMPTS = 4
+    DEFAULT_BASE_DELAY = 0.5
+    DEFAULT_MAXIMUM_DELAY = 30
+
+    retry_statuses = [429, 503]
+
+    def __init__(
+        self,
+        name,
+        initial_concurrency=DEFAULT_INITIAL_CONCURRENCY,
+        maximum_concurrency=DEFAULT_MAXIMUM_CONCURRENCY,
+        rate=None,
+        attempts=DEFAULT_ATTEMPTS,
+        base_delay=DEFAULT_BASE_DELAY,
+        maximum_delay=DEFAULT_MAXIMUM_DELAY,
+        decrease_factor=DEFAULT_DECREASE_FACTOR,
+        failures_are_overload=True
+    ):
+        self.__name = name
+        self.__maximum_concurrency = max(1, maximum_concurrency)
+        self.__limit = float(max(1, min(initial_concurrency, self.__maximum_concurrency)))
+        self.__bucket = TokenBucket(rate) if rate else None
+        self.__attempts = max(1, attempts)
+        self.__base_delay = base_delay
+        self.__maximum_delay = maximum_delay
+        self.__decrease_factor = decrease_factor
+        self.__failures_are_overload = failures_are_overload
+        self.__slow_start = True
+        self.__in_flight = 0
+        self.__waiters = deque()
+        self.__epoch = 0
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def concurrency_limit(self):
+        return int(self.__limit)
+
+    @property
+    def in_flight(self):
+        return self.__in_flight
+
+    @property
+    def attempts(self):
+        return self.__attempts
+
+    def backoff(self, attempt):
+        # Full jitter keeps retrying clients from synchronizing.
+        return random.uniform(0, min(self.__maximum_delay, self.__base_delay * 2 ** (attempt - 1)))
+
+    async def __acquire(self):
+        while self.__in_flight >= self.concurrency_limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self.__waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self.__waiters:
+                    self.__waiters.remove(waiter)
+                else:
+                    self.__wake()
+                raise
+
+        self.__in_flight += 1
+
+        if self.__bucket is not None:
+            try:
+                await self.__bucket.acquire()
+            except asyncio.CancelledError:
+                self.__in_flight -= 1
+                self.__wake()
+                raise
+
+        return self.__epoch
+
+    def __release(self, epoch, overloaded, succeeded=True):
+        self.__in_flight -= 1
+
+        if overloaded:
+            if epoch == self.__epoch:
+                # Multiplicative decrease, once per overload event: requests
+                # that started before the last decrease do not shrink the
+                # limit again.
+                self.__limit = max(1.0, self.__limit * self.__decrease_factor)
+                self.__epoch += 1
+
+            self.__slow_start = False
+        elif succeeded:
+            # Slow start doubles the limit every window until the first
+            # overload; after that, roughly one more slot per window.
+            increase = 1 if self.__slow_start else 1 / self.__limit
+            self.__limit = min(self.__maximum_concurrency, self.__limit + increase)
+
+        self.__wake()
+
+    def __wake(self):
+        available = self.concurrency_limit - self.__in_flight
+
+        while available > 0 and self.__waiters:
+            waiter = self.__waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+    async def request(self, operation):
+        # operation returns (status, result); retryable statuses back off and
+        # are retried. Connection failures and timeouts are too, unless they
+        # belong to the target rather than a shared endpoint, as with probes
+        # of many canister hosts, in which case they are raised as they are.
+        for attempt in range(1, self.attempts + 1):
+            epoch = await self.__acquire()
+
+            try:
+                status, result = await operation()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not self.__failures_are_overload:
+                    self.__release(epoch, overloaded=False, succeeded=False)
+                    raise
+
+                self.__release(epoch, overloaded=True)
+                if attempt == self.attempts:
+                    raise
+            except BaseException:
+                self.__release(epoch, overloaded=False, succeeded=False)
+                raise
+            else:
+                overloaded = status in self.retry_statuses
+                self.__release(epoch, overloaded)
+
+                if not overloaded:
+                    return result
+
+                if attempt == self.attempts:
+                    raise EndpointOverloadedError(self.name, status)
+
+            await asyncio.sleep(self.backoff(attempt))
@@ -0,0 +1,378 @@
+import csv
+import gzip
+import io
+import json
+import sys
+from operator import attrgetter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class CanisterWriter:
+    DEFAULT_BUFFER_SIZE = 1 << 16
+
+    default_fields = [
+        '_id',
+        'canister_id',
+        'controllers',
+        'is_web_canister',
+        'last_probed_at',
+        'last_status_code',
+        'module_hash',
+        'module_hash_changed_at',
+        'raw_canister_url',
+        'subnet_id',
+    ]
+
+    compressions = ['gzip', 'zstd', 'none']
+
+    compression_extensions = {
+        '.gz': 'gzip',
+        '.zst': 'zstd',
+        '.zstd': 'zstd',
+    }
+
+    def __init__(
+        self,
+        stream=None,
+        fields_to_output=None,
+        buffer_size=DEFAULT_BUFFER_SIZE,
+        output_file=None,
+        compression=None
+    ):
+        # Standard output is text, so a codec would otherwise be dropped silently.
+        if output_file is None and compression not in (None, 'none'):
+            raise ValueError(f'{compression} compression requires an output file.')
+
+        self.__owns_stream = stream is None and output_file is not None
+
+        if self.__owns_stream:
+            stream = self.open_file(output_file, compression)
+
+        self.__stream = stream if stream is not None else sys.stdout
+        self.__fields = list(fields_to_output) if fields_to_output else list(self.default_fields)
+        self.__getters = [self.field_getter(field) for field in self.__fields]
+        self.__buffer_size = buffer_size
+        self.__buffer = []
+        self.__buffered = 0
+        self.__count = 0
+
+    @property
+    def stream(self):
+        return self.__stream
+
+    @staticmethod
+    def field_getter(field):
+        # Resolved once per export rather than once per row.
+        match field:
+            case '_id':
+                return lambda canister: str(canister._id)
+            case _:
+                return attrgetter(field)
+
+    @classmethod
+    def compression_for(cls, path, compression=None):
+        if compression:
+            return compression
+
+        for extension, extension_compression in cls.compression_extensions.items():
+            if str(path).endswith(extension):
+                return extension_compression
+
+        return 'none'
+
+    @classmethod
+    def open_file(cls, path, compression=None, mode='wt'):
+        match cls.compression_for(path, compression):
+            case 'gzip':
+                return gzip.open(path, mode, encoding='utf-8')
+            case 'zstd':
+                if zstandard is None:
+                    raise RuntimeError('zstd compression requires the zstandard package.')
+                return zstandard.open(path, mode, encoding='utf-8')
+            case _:
+                return open(path, mode, encoding='utf-8', newline='')
+
+    @staticmethod
+    def json_dumps(value):
+        if orjson is not None:
+            return orjson.dumps(value).decode()
+
+        return json.dumps(value)
+
+    @classmethod
+    def for_output(cls, output, stream=None, fields_to_output=None, **kwargs):
+        if not output:
+            return None
+
+        return writer_classes[output](stream=stream, fields_to_output=fields_to_output, **kwargs)
+
+    @property
+    def fields(self):
+        return self.__fields
+
+    @property
+    def getters(self):
+        return self.__getters
+
+    @property
+    def count(self):
+        return self.__count
+
+    def values(self, canister):
+        return [getter(canister) for getter in self.getters]
+
+    def emit(self, text):
+        self.__buffer.append(text)
+        self.__buffered += len(text)
+
+        if self.__buffered >= self.__buffer_size:
+            self.__drain()
+
+    def __drain(self):
+        # Hands buffered rows to the stream without forcing it to flush, so
+        # compressors keep their full window.
+        if self.__buffer:
+            self.stream.write(''.join(self.__buffer))
+            self.__buffer = []
+            self.__buffered = 0
+
+    def flush(self):
+        self.__drain()
+        self.stream.flush()
+
+    def header(self):
+        return ''
+
+    def footer(self):
+        return ''
+
+    def row(self, canister):
+        raise NotImplementedError
+
+    def open(self):
+        self.emit(self.header())
+
+    def write(self, canister):
+        self.emit(self.row(canister))
+        self.__count += 1
+
+    def close(self):
+        self.emit(self.footer())
+        self.flush()
+
+        if self.__owns_stream:
+            self.stream.close()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvCanisterWriter(CanisterWriter):
+    format_name = 'csv'
+
+    default_fields = [
+        '_id',
+        'canister_id',
+        'controllers',
+        'is_web_canister',
+        'last_status_code',
+        'module_hash',
+        'subnet_id',
+    ]
+
+    def __init__(self, stream=None, fields_to_output=None, **kwargs):
+        super().__init__(stream, fields_to_output, **kwargs)
+        self.__line = io.StringIO()
+        self.__csv_writer = csv.writer(self.__line, lineterminator='\n')
+
+    def format(self, values):
+        self.__csv_writer.writerow(values)
+        line = self.__line.getvalue()
+        self.__line.seek(0)
+        self.__line.truncate()
+
+        return line
+
+    @staticmethod
+    def value(value):
+        if isinstance(value, list):
+            return ' '.join(value)
+
+        return str(value)
+
+    def header(self):
+        return self.format(self.fields)
+
+    def row(self, canister):
+        return self.format([self.value(value) for value in self.values(canister)])
+
+
+class JsonCanisterWriter(CanisterWriter):
+    format_name = 'json'
+
+    def __init__(self, stream=None, fields_to_output=None, envelope=True, **kwargs):
+        super().__init__(stream, fields_to_output, **kwargs)
+        self.__envelope = envelope
+
+    @property
+    def envelope(self):
+        return self.__envelope
+
+    def header(self):
+        return '{"data":[\n' if self.envelope else ''
+
+    def footer(self):
+        return '\n]}\n' if self.envelope else ''
+
+    def row(self, canister):
+        document = self.json_dumps(dict(zip(self.fields, self.values(canister))))
+
+        if not self.envelope:
+            return document + '\n'
+
+        if self.count:
+            return ',\n' + document
+
+        return document
+
+
+class NdjsonCanisterWriter(JsonCanisterWriter):
+    format_name = 'ndjson'
+
+    def __init__(self, stream=None, fields_to_output=None, **kwargs):
+        super().__init__(stream, fields_to_output, envelope=False, **kwargs)
+
+
+class ParquetCanisterWriter(CanisterWriter):
+    format_name = 'parquet'
+
+    DEFAULT_ROW_GROUP_SIZE = 100000
+
+    DEFAULT_COMPRESSION = 'zstd'
+
+    dictionary_fields = ['subnet_id', 'module_hash']
+
+    def __init__(
+        self,
+        stream=None,
+        fields_to_output=None,
+        output_file=None,
+        compression=None,
+        row_group_size=DEFAULT_ROW_GROUP_SIZE,
+        **kwargs
+    ):
+        if pyarrow is None:
+            raise RuntimeError('parquet output requires the pyarrow package.')
+
+        if output_file is None:
+            raise ValueError('parquet output requires an output file.')
+
+        # Parquet compresses each column chunk itself, so the file is opened
+        # as is and the codec is handed to the parquet writer instead.
+        super().__init__(open(output_file, 'wb'), fields_to_output, **kwargs)
+
+        self.__compression = self.codec(compression)
+        self.__row_group_size = row_group_size
+        self.__columns = [[] for _ in self.fields]
+        self.__parquet_writer = None
+        self.__count = 0
+
+    @classmethod
+    def codec(cls, compression):
+        match compression:
+            case None:
+                return cls.DEFAULT_COMPRESSION
+            case 'none':
+                return 'NONE'
+            case _:
+                return compression
+
+    @classmethod
+    def field_type(cls, field):
+        match field:
+            case 'controllers':
+                return pyarrow.list_(pyarrow.string())
+            case 'is_web_canister':
+                return pyarrow.bool_()
+            case 'last_status_code':
+                return pyarrow.int32()
+            case 'last_probed_at' | 'module_hash_changed_at':
+                return pyarrow.float64()
+            case _:
+                return pyarrow.string()
+
+    @staticmethod
+    def field_getter(field):
+        match field:
+            case '_id':
+                return lambda canister: None if canister._id is None else str(canister._id)
+            case _:
+                return attrgetter(field)
+
+    @property
+    def count(self):
+        return self.__count
+
+    @property
+    def schema(self):
+        return pyarrow.schema([(field, self.field_type(field)) for field in self.fields])
+
+    def open(self):
+        self.__parquet_writer = pyarrow.parquet.ParquetWriter(
+            self.stream,
+            self.schema,
+            compression=self.__compression,
+            use_dictionary=[field for field in self.dictionary_fields if field in self.fields]
+        )
+
+    def write(self, canister):
+        for column, value in zip(self.__columns, self.values(canister)):
+            column.append(value)
+
+        self.__count += 1
+
+        if len(self.__columns[0]) >= self.__row_group_size:
+            self.__write_row_group()
+
+    def __write_row_group(self):
+        if not self.__columns[0]:
+            return
+
+        self.__parquet_writer.write_batch(
+            pyarrow.record_batch(self.__columns, schema=self.schema),
+            row_group_size=self.__row_group_size
+        )
+
+        self.__columns = [[] for _ in self.fields]
+
+    def close(self):
+        self.__write_row_group()
+        self.__parquet_writer.close()
+        self.stream.close()
+
+
+writer_classes = {
+    CsvCanisterWriter.format_name: CsvCanisterWriter,
+    JsonCanisterWriter.format_name: JsonCanisterWriter,
+    NdjsonCanisterWriter.format_name: NdjsonCanisterWriter,
+    ParquetCanisterWriter.format_name: ParquetCanisterWriter,
+}
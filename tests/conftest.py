@@ -1,8 +1,13 @@
+import asyncio
 import os
+import random
+import threading
 from pathlib import Path
 
 import pytest
+from aiohttp import web
 from pymongo.database import Database
+from pymongo.results import BulkWriteResult
 
 from internet_computer.tools.pymongo_fixes import MongoClientConfigurator
 
@@ -12,6 +17,13 @@ def mongo_client():
     return MongoClientHelper.mongo_client
 
 
+@pytest.fixture
+def http_server():
+    server = HttpServer()
+    yield server
+    server.close()
+
+
 class MongoClientHelper:
     __mongo_client: Database = None
 
@@ -27,3 +39,155 @@ class MongoClientHelper:
             ).from_config()
 
         return cls.__mongo_client
+
+
+class FakeCollection:
+    def __init__(self, documents=(), rows=(), failure=None):
+        self.documents = list(documents)
+        self.rows = list(rows)
+        self.failure = failure
+        self.queries = []
+        self.batches = []
+        self.calls = []
+
+    @staticmethod
+    def matches(document, query_filter):
+        for field, condition in (query_filter or {}).items():
+            value = document.get(field)
+
+            if not isinstance(condition, dict):
+                if value != condition:
+                    return False
+                continue
+
+            for operator, operand in condition.items():
+                match operator:
+                    case '$in':
+                        values = value if isinstance(value, list) else [value]
+                        if not set(values) & set(operand):
+                            return False
+                    case '$gt':
+                        if value is None or not value > operand:
+                            return False
+                    case '$gte':
+                        if value is None or not value >= operand:
+                            return False
+                    case '$lt':
+                        if value is None or not value < operand:
+                            return False
+                    case _:
+                        raise NotImplementedError(operator)
+
+        return True
+
+    def find(self, query_filter=None, projection=None, sort=None, limit=0, hint=None, batch_size=None):
+        self.queries.append((query_filter, hint))
+
+        documents = [document for document in self.documents if self.matches(document, query_filter)]
+        for field, direction in reversed(sort or []):
+            documents.sort(key=lambda document: document[field], reverse=direction < 0)
+
+        return iter(documents[:limit] if limit else documents)
+
+    def bulk_write(self, operations, ordered=True):
+        assert ordered is False
+
+        if self.failure is not None:
+            raise self.failure
+
+        self.batches.append(operations)
+        return BulkWriteResult({'nUpserted': len(operations), 'nModified': 0}, True)
+
+    def aggregate(self, pipeline, **options):
+        self.calls.append((pipeline, options))
+        return iter(self.rows)
+
+
+class FakeDataFetcher:
+    DEFAULT_LIMIT = 7
+
+    def __init__(self, canisters, limit=DEFAULT_LIMIT, ordered=True, max_canister_index=None):
+        self.canisters = canisters
+        self.limit = limit
+        self.ordered = ordered
+        self.max_canister_index = max_canister_index
+        self.offset = 0
+
+    async def fetch_pages_async(self):
+        for start in range(0, len(self.canisters), self.limit):
+            yield self.offset + start, self.canisters[start:start + self.limit]
+
+
+class FakeProbe:
+    async def status(self, url):
+        await asyncio.sleep(random.random() / 100)
+        return 200
+
+    async def close(self):
+        pass
+
+
+class FakeWriter:
+    def __init__(self):
+        self.puts = []
+
+    @property
+    def canisters(self):
+        return [canister for canister, _ in self.puts]
+
+    def put(self, canister, stale_fields=()):
+        self.puts.append((canister, stale_fields))
+
+    async def put_async(self, canister, stale_fields=()):
+        self.put(canister, stale_fields)
+
+    def flush(self):
+        pass
+
+
+class MemoryCheckpoint:
+    def __init__(self, state=None):
+        self.states = [state] if state is not None else []
+
+    def load(self):
+        return self.states[-1] if self.states else None
+
+    def save_due(self):
+        return True
+
+    def save(self, state):
+        self.states.append(state)
+
+
+class HttpServer:
+    # Serves on its own event loop thread, so both asyncio.run clients and
+    # blocking clients can talk to it.
+    def __init__(self):
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        self.__thread.start()
+        self.__runners = []
+
+    def serve(self, handler, path='/'):
+        async def start():
+            app = web.Application()
+            app.router.add_route('*', path, handler)
+
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, '127.0.0.1', 0).start()
+
+            return runner
+
+        runner = asyncio.run_coroutine_threadsafe(start(), self.__loop).result()
+        self.__runners.append(runner)
+
+        return f'http://127.0.0.1:{runner.addresses[0][1]}'
+
+    def close(self):
+        for runner in self.__runners:
+            asyncio.run_coroutine_threadsafe(runner.cleanup(), self.__loop).result()
+
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+        self.__loop.close()
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+
+from pymongo.results import BulkWriteResult
+
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.persistence import CanisterBulkWriter, ThreadedCanisterWriter
+from tests.conftest import FakeCollection
+
+
+def build_canister(index):
+    return Canister(
+        canister_id=f'canister-{index}',
+        controllers=['controller'],
+        subnet_id='subnet'
+    )
+
+
+def test_canisters_are_upserted_in_batches():
+    collection = FakeCollection()
+    Canister.set_client({Canister.collection_name: collection})
+
+    with CanisterBulkWriter(batch_size=2, flush_interval=60) as writer:
+        for index in range(5):
+            writer.add(build_canister(index))
+
+    assert [len(batch) for batch in collection.batches] == [2, 2, 1]
+    assert writer.upserted_count == 5
+
+
+def test_upserts_are_keyed_on_canister_id_and_skip_unset_fields():
+    operation = CanisterBulkWriter.upsert_operation(build_canister(1))
+
+    assert operation._filter == {'canister_id': 'canister-1'}
+    assert operation._doc == {
+        '$set': {
+            'canister_id': 'canister-1',
+            'controllers': ['controller'],
+            'subnet_id': 'subnet'
+        }
+    }
+    assert operation._upsert is True
+
+
+def test_threaded_writer_flushes_everything_on_close():
+    collection = FakeCollection()
+    Canister.set_client({Canister.collection_name: collection})
+
+    with ThreadedCanisterWriter(batch_size=3, flush_interval=60) as writer:
+        for index in range(4):
+            writer.put(build_canister(index))
+
+        writer.flush()
+
+        assert sum(len(batch) for batch in collection.batches) == 4
+
+        writer.put(build_canister(5))
+
+    assert sum(len(batch) for batch in collection.batches) == 5
+
+
+def test_upserts_with_a_module_hash_stamp_module_hash_changes():
+    canister = Canister(canister_id='canister-1', module_hash='abc')
+
+    operation = CanisterBulkWriter.upsert_operation(canister, stale_fields=('last_status_code',))
+
+    changed_at, fields, unset = operation._doc
+
+    assert changed_at['$set']['module_hash_changed_at']['$cond'][0] == {
+        '$ne': [{'$ifNull': ['$module_hash', 'abc']}, {'$literal': 'abc'}]
+    }
+    assert fields == {'$set': {
+        'canister_id': {'$literal': 'canister-1'},
+        'module_hash': {'$literal': 'abc'},
+    }}
+    assert unset == {'$unset': ['last_status_code']}
+
+
+def test_threaded_writer_backlog_is_bounded_without_blocking_the_event_loop():
+    released = threading.Event()
+
+    class SlowCollection(FakeCollection):
+        def bulk_write(self, operations, ordered=True):
+            released.wait()
+            return super().bulk_write(operations, ordered)
+
+    collection = SlowCollection()
+    Canister.set_client({Canister.collection_name: collection})
+
+    async def produce(writer):
+        backlogs = []
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticker = asyncio.create_task(tick())
+
+        try:
+            producer = asyncio.ensure_future(
+                asyncio.gather(*(writer.put_async(build_canister(index)) for index in range(20)))
+            )
+            await asyncio.sleep(0.05)
+            backlogs.append((writer.backlog, producer.done()))
+        finally:
+            released.set()
+
+        await producer
+        ticker.cancel()
+
+        return backlogs, ticks
+
+    with ThreadedCanisterWriter(batch_size=1, flush_interval=60, max_backlog=3) as writer:
+        backlogs, ticks = asyncio.run(produce(writer))
+
+    assert backlogs == [(3, False)]
+    assert ticks > 10
+    assert sum(len(batch) for batch in collection.batches) == 20
+
+
+def test_unacknowledged_bulk_writes_are_flushed_without_counts():
+    class UnacknowledgedCollection(FakeCollection):
+        def bulk_write(self, operations, ordered=True):
+            super().bulk_write(operations, ordered)
+            return BulkWriteResult({}, False)
+
+    collection = UnacknowledgedCollection()
+    Canister.set_client({Canister.collection_name: collection})
+
+    with CanisterBulkWriter(batch_size=2, flush_interval=60) as writer:
+        for index in range(3):
+            writer.add(build_canister(index))
+
+    assert [len(batch) for batch in collection.batches] == [2, 1]
+    assert writer.upserted_count == 0
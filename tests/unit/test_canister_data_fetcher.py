@@ -0,0 +1,50 @@
+import asyncio
+import random
+
+from internet_computer.tools.inventory import CanisterDataFetcher, CanisterMetadata
+
+TOTAL_CANISTERS = 35
+
+
+async def fake_fetch_async(self, session, throttle=None):
+    offset, limit = [
+        int(part.split('=')[1]) for part in self.url.split('?')[1].split('&')
+    ]
+
+    await asyncio.sleep(random.random() / 100)
+
+    self._CanisterMetadata__load({
+        'total_canisters': TOTAL_CANISTERS,
+        'max_canister_index': TOTAL_CANISTERS - 1,
+        'data': [
+            {'canister_id': f'canister-{index:04d}'}
+            for index in range(offset, min(offset + limit, TOTAL_CANISTERS))
+        ]
+    })
+
+    return self
+
+
+async def collect(fetcher):
+    return [canister.canister_id async for canister in fetcher.fetch_async(session=object())]
+
+
+def test_concurrent_fetch_yields_canisters_in_order(monkeypatch):
+    monkeypatch.setattr(CanisterMetadata, 'fetch_async', fake_fetch_async)
+
+    fetcher = CanisterDataFetcher('http://canisters', limit=4, concurrency=3)
+
+    canister_ids = asyncio.run(collect(fetcher))
+
+    assert canister_ids == [f'canister-{index:04d}' for index in range(TOTAL_CANISTERS)]
+    assert fetcher.offset > TOTAL_CANISTERS - 1
+
+
+def test_unordered_fetch_yields_every_canister_once(monkeypatch):
+    monkeypatch.setattr(CanisterMetadata, 'fetch_async', fake_fetch_async)
+
+    fetcher = CanisterDataFetcher('http://canisters', limit=4, concurrency=5, ordered=False)
+
+    canister_ids = asyncio.run(collect(fetcher))
+
+    assert sorted(canister_ids) == [f'canister-{index:04d}' for index in range(TOTAL_CANISTERS)]
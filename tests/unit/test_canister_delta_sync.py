@@ -0,0 +1,36 @@
+import asyncio
+
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.sync import CanisterDeltaSync
+from tests.conftest import FakeDataFetcher, FakeWriter, MemoryCheckpoint
+
+
+def test_only_new_and_changed_canisters_are_written(monkeypatch):
+    stored = {
+        'unchanged': {'canister_id': 'unchanged', 'module_hash': 'a', 'controllers': ['x', 'y']},
+        'upgraded': {'canister_id': 'upgraded', 'module_hash': 'a', 'controllers': ['x']},
+        'handed_over': {'canister_id': 'handed_over', 'module_hash': 'a', 'controllers': ['x']},
+    }
+    monkeypatch.setattr(CanisterDeltaSync, 'stored', classmethod(lambda cls, canisters: stored))
+
+    canisters = [
+        Canister(canister_id='unchanged', module_hash='a', controllers=['y', 'x']),
+        Canister(canister_id='upgraded', module_hash='b', controllers=['x']),
+        Canister(canister_id='handed_over', module_hash='a', controllers=['z']),
+        Canister(canister_id='new', module_hash='c', controllers=['x']),
+    ]
+
+    writer = FakeWriter()
+    state = MemoryCheckpoint({'max_canister_index': 10})
+    data_fetcher = FakeDataFetcher(canisters, max_canister_index=14)
+
+    counts = asyncio.run(CanisterDeltaSync(data_fetcher, writer, state).run())
+
+    assert counts == {'inserted': 1, 'updated': 2, 'unchanged': 1}
+    assert data_fetcher.offset == 11
+    assert [(canister.canister_id, stale_fields) for canister, stale_fields in writer.puts] == [
+        ('new', ()),
+        ('upgraded', CanisterDeltaSync.web_status_fields),
+        ('handed_over', CanisterDeltaSync.web_status_fields),
+    ]
+    assert state.load() == {'max_canister_index': 14}
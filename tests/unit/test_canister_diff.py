@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from internet_computer.tools.commands import CanisterSnapshotDiffer
+from internet_computer.tools.diff import CanisterDiff
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.snapshot import CanisterSnapshotWriter
+
+
+def write_snapshot(path, canisters):
+    with CanisterSnapshotWriter(path) as writer:
+        for canister in canisters:
+            writer.add(canister)
+
+
+def test_snapshot_diff_emits_one_event_per_change(tmp_path):
+    write_snapshot(tmp_path / 'old.snapshot', [
+        Canister(canister_id='a', module_hash='v1', controllers=['x', 'y']),
+        Canister(canister_id='b', module_hash='v1'),
+        Canister(canister_id='c', module_hash='v1', is_web_canister=False),
+    ])
+    write_snapshot(tmp_path / 'new.snapshot', [
+        Canister(canister_id='a', module_hash='v2', controllers=['y', 'x']),
+        Canister(canister_id='c', module_hash='v1', is_web_canister=True),
+        Canister(canister_id='d', module_hash='v1'),
+    ])
+
+    output_file = tmp_path / 'changes.ndjson'
+    counts = CanisterSnapshotDiffer().diff(
+        old_location=str(tmp_path / 'old.snapshot'),
+        new_location=str(tmp_path / 'new.snapshot'),
+        output_file=str(output_file)
+    )
+
+    changes = [json.loads(line) for line in output_file.read_text().splitlines()]
+
+    assert [(change['event'], change['canister_id']) for change in changes] == [
+        ('changed', 'a'), ('removed', 'b'), ('changed', 'c'), ('added', 'd'),
+    ]
+    assert changes[0]['changes'] == {'module_hash': {'old': 'v1', 'new': 'v2'}}
+    assert changes[2]['changes'] == {'is_web_canister': {'old': False, 'new': True}}
+    assert counts == {'added': 1, 'removed': 1, 'changed': 2, 'unchanged': 0}
+
+
+def test_unsorted_sources_are_rejected():
+    canister_diff = CanisterDiff(
+        [Canister(canister_id='b'), Canister(canister_id='a')],
+        [Canister(canister_id='a')]
+    )
+
+    with pytest.raises(ValueError):
+        list(canister_diff.changes())
@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+import pytest
+
+from internet_computer.tools import commands
+from internet_computer.tools.commands import CanisterFetcher
+from internet_computer.tools.inventory import Canister
+from tests.conftest import FakeProbe
+
+
+class FailingPipeline:
+    def __init__(self, data_fetcher, emit, **kwargs):
+        self.emit = emit
+
+    async def run(self):
+        self.emit(Canister(canister_id='canister-1'))
+        raise RuntimeError('source went away')
+
+
+def test_the_output_is_closed_when_the_fetch_fails(monkeypatch, tmp_path):
+    monkeypatch.setattr(commands, 'CanisterPipeline', FailingPipeline)
+    output_file = tmp_path / 'canisters.json'
+
+    with pytest.raises(RuntimeError, match='source went away'):
+        asyncio.run(CanisterFetcher().fetch(
+            pymongo_config_path='pymongo.yml',
+            environment='test',
+            fields_to_output=['canister_id'],
+            maximum_canister_count=None,
+            maximum_time_limit=None,
+            output='json',
+            source_url='https://ic-api.internetcomputer.org/api/v3/canisters',
+            store_to_mongo=False,
+            verify_web_canister=False,
+            probe=FakeProbe(),
+            output_file=str(output_file)
+        ))
+
+    assert json.loads(output_file.read_text()) == {'data': [{'canister_id': 'canister-1'}]}
@@ -0,0 +1,51 @@
+import asyncio
+import io
+import json
+from string import Template
+
+from aiohttp import web
+
+from internet_computer.tools.commands import CanisterLookup
+from internet_computer.tools.inventory import Canister
+
+
+def test_lookups_run_concurrently_and_report_unknown_ids(monkeypatch, http_server):
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        canister_id = request.match_info['canister_id']
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+        if canister_id == 'missing':
+            return web.Response(status=404, text='{"detail": "Not found"}')
+
+        return web.Response(text=json.dumps({'canister_id': canister_id, 'subnet_id': 'subnet-a'}))
+
+    url = http_server.serve(handler, '/{canister_id}')
+    monkeypatch.setattr(Canister, 'canister_index_template', Template(f'{url}/$canister_id'))
+
+    async def lookup_all():
+        canister_ids = [f'canister-{index}' for index in range(20)] + ['missing']
+
+        return [
+            (canister_id, canister.subnet_id if canister is not None else None)
+            async for canister_id, canister in Canister.from_internet_computer_many(canister_ids, concurrency=4)
+        ]
+
+    results = asyncio.run(lookup_all())
+
+    assert sorted(results) == sorted(
+        [(f'canister-{index}', 'subnet-a') for index in range(20)] + [('missing', None)]
+    )
+    assert 1 < peak <= 4
+
+
+def test_ids_are_read_one_per_line_skipping_blanks_and_comments():
+    stream = io.StringIO('# report\naaaaa-aa\n\n  bbbbb-bb  \n')
+
+    assert list(CanisterLookup.read_ids(stream)) == ['aaaaa-aa', 'bbbbb-bb']
@@ -0,0 +1,84 @@
+import asyncio
+
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.membership import KnownCanisters
+from internet_computer.tools.pipeline import CanisterPipeline
+from tests.conftest import FakeDataFetcher, FakeProbe, FakeWriter, MemoryCheckpoint
+
+
+def numbered_canisters(total, ordered=True):
+    return FakeDataFetcher(
+        [Canister(canister_id=f'canister-{index:04d}') for index in range(total)],
+        ordered=ordered
+    )
+
+
+def run_pipeline(data_fetcher, **kwargs):
+    emitted = []
+    writer = FakeWriter()
+
+    pipeline = CanisterPipeline(
+        data_fetcher,
+        emit=emitted.append,
+        writer=writer,
+        **{'probe': FakeProbe(), 'probe_concurrency': 8, 'queue_size': 4, **kwargs}
+    )
+
+    asyncio.run(pipeline.run())
+
+    return emitted, writer.canisters
+
+
+def test_probed_canisters_are_stored_and_emitted_in_fetch_order():
+    emitted, stored = run_pipeline(numbered_canisters(50))
+
+    assert [canister.canister_id for canister in emitted] == [
+        f'canister-{index:04d}' for index in range(50)
+    ]
+    assert len(stored) == 50
+    assert all(canister.is_web_canister for canister in emitted)
+
+
+def test_the_maximum_canister_count_is_applied():
+    emitted, stored = run_pipeline(numbered_canisters(50, ordered=False), maximum_canister_count=10)
+
+    assert len(emitted) == 10
+    assert len(stored) == 10
+
+
+def test_checkpoints_only_advance_past_fully_emitted_pages():
+    checkpoint = MemoryCheckpoint()
+
+    emitted, _ = run_pipeline(numbered_canisters(50), maximum_canister_count=30, checkpoint=checkpoint)
+
+    assert len(emitted) == 30
+    assert checkpoint.states[-1] == {'offset': 28}
+    assert all(state['offset'] % FakeDataFetcher.DEFAULT_LIMIT == 0 for state in checkpoint.states)
+
+
+def known_even_canisters():
+    return KnownCanisters.from_documents(
+        [{'canister_id': f'canister-{index:04d}'} for index in range(0, 50, 2)]
+        + [{'canister_id': 'canister-0001', 'module_hash': 'changed'}]
+    )
+
+
+def test_known_unchanged_canisters_are_neither_probed_nor_stored_nor_emitted():
+    checkpoint = MemoryCheckpoint()
+
+    emitted, stored = run_pipeline(numbered_canisters(50), known=known_even_canisters(), checkpoint=checkpoint)
+
+    odd_canisters = [f'canister-{index:04d}' for index in range(1, 50, 2)]
+    assert [canister.canister_id for canister in emitted] == odd_canisters
+    assert sorted(canister.canister_id for canister in stored) == odd_canisters
+    assert all(canister.is_web_canister for canister in emitted)
+    assert checkpoint.states[-1]['offset'] >= 50
+
+
+def test_known_unchanged_canisters_are_emitted_without_a_probe():
+    emitted, stored = run_pipeline(numbered_canisters(50), known=known_even_canisters(), probe=None)
+
+    assert len(emitted) == 50
+    assert sorted(canister.canister_id for canister in stored) == [
+        f'canister-{index:04d}' for index in range(1, 50, 2)
+    ]
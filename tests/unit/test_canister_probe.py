@@ -0,0 +1,60 @@
+import asyncio
+
+from aiohttp import web
+
+from internet_computer.tools.probe import CanisterProbe, SyncCanisterProbe
+from internet_computer.tools.throttle import EndpointThrottle
+
+
+def responding(status):
+    async def handler(request):
+        return web.Response(status=status, body=b'x' * 1024 * 1024)
+
+    return handler
+
+
+def test_probe_returns_the_status_code_for_each_method(http_server):
+    url = http_server.serve(responding(451)) + '/'
+
+    async def probe_all():
+        statuses = []
+        for method in CanisterProbe.methods:
+            async with CanisterProbe(method=method) as probe:
+                statuses.append(await probe.status(url))
+
+        return statuses
+
+    assert asyncio.run(probe_all()) == [451, 451]
+
+
+def test_sync_probe_reuses_a_single_session(http_server):
+    url = http_server.serve(responding(200)) + '/'
+
+    sync_probe = SyncCanisterProbe()
+    try:
+        assert sync_probe.status(url) == 200
+        session = sync_probe.probe.session()
+        assert sync_probe.status(url) == 200
+        assert sync_probe.probe.session() is session
+    finally:
+        sync_probe.close()
+
+
+def test_probe_retries_overloaded_responses_instead_of_returning_them(http_server):
+    statuses = iter([429, 503, 451])
+
+    async def handler(request):
+        return web.Response(status=next(statuses))
+
+    url = http_server.serve(handler) + '/'
+
+    async def probe_flaky():
+        throttle = EndpointThrottle('web_probe', base_delay=0.01)
+        async with CanisterProbe(throttle=throttle) as probe:
+            return await probe.status(url)
+
+    assert asyncio.run(probe_flaky()) == 451
+
+
+def test_probes_start_at_full_concurrency():
+    assert CanisterProbe(connection_limit=256).throttle.concurrency_limit == 256
@@ -0,0 +1,27 @@
+import asyncio
+import time
+
+from internet_computer.tools.scheduler import CanisterProbeScheduler
+from internet_computer.tools.throttle import TokenBucket
+
+
+def test_tiers_are_ordered_by_priority():
+    scheduler = CanisterProbeScheduler(max_age=3600)
+
+    tiers = scheduler.tiers(now=10000)
+
+    assert [name for name, _, _ in tiers] == ['never_checked', 'stalest', 'module_hash_changed']
+    assert tiers[1][1]['$or'][0] == {'last_probed_at': {'$lt': 6400}}
+    assert tiers[1][2] == [('last_probed_at', 1)]
+    assert tiers[2][1]['last_probed_at'] == {'$gte': 6400}
+
+
+def test_the_token_bucket_holds_acquisitions_to_its_rate():
+    async def acquire_all():
+        bucket = TokenBucket(rate=100, capacity=1)
+        start_time = time.monotonic()
+        for _ in range(21):
+            await bucket.acquire()
+        return time.monotonic() - start_time
+
+    assert 0.18 <= asyncio.run(acquire_all()) < 0.5
@@ -0,0 +1,97 @@
+import pytest
+
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.snapshot import CanisterSnapshot, CanisterSnapshotWriter
+
+
+def canisters():
+    return [
+        Canister(
+            canister_id='ryjl3-tyaaa-aaaaa-aaaba-cai',
+            controllers=['r7inp-6aaaa-aaaaa-aaabq-cai'],
+            module_hash='abc',
+            subnet_id='subnet-a',
+            last_status_code=200,
+            is_web_canister=True,
+            last_probed_at=1700000000.5
+        ),
+        Canister(canister_id='aaaaa-aa', controllers=[], subnet_id='subnet-b'),
+        Canister(canister_id='qoctq-giaaa-aaaaa-aaaea-cai', subnet_id='subnet-a'),
+    ]
+
+
+def test_lookups_find_every_canister_and_nothing_else(tmp_path):
+    path = tmp_path / 'canisters.snapshot'
+    with CanisterSnapshotWriter(path) as writer:
+        for canister in canisters():
+            writer.add(canister)
+
+    with CanisterSnapshot(path) as snapshot:
+        assert len(snapshot) == 3
+        assert [canister.canister_id for canister in snapshot] == sorted(
+            canister.canister_id for canister in canisters()
+        )
+
+        found = snapshot.get('ryjl3-tyaaa-aaaaa-aaaba-cai')
+        assert found.to_document() == canisters()[0].to_document()
+
+        assert snapshot.get('aaaaa-aa').controllers == []
+        assert snapshot.get('qoctq-giaaa-aaaaa-aaaea-cai').controllers is None
+        assert snapshot.get('subnet-a') is None
+        assert 'zzzzz-zz' not in snapshot
+
+        assert [canister.canister_id for canister in snapshot.by_subnet('subnet-a')] == [
+            'qoctq-giaaa-aaaaa-aaaea-cai',
+            'ryjl3-tyaaa-aaaaa-aaaba-cai',
+        ]
+        assert list(snapshot.by_subnet('subnet-z')) == []
+
+
+def test_sorted_and_unsorted_input_write_the_same_snapshot(tmp_path):
+    unsorted_path = tmp_path / 'unsorted.snapshot'
+    with CanisterSnapshotWriter(unsorted_path) as writer:
+        for canister in canisters():
+            writer.add(canister)
+
+    sorted_path = tmp_path / 'sorted.snapshot'
+    with CanisterSnapshotWriter(sorted_path) as writer:
+        for canister in sorted(canisters(), key=lambda canister: canister.canister_id):
+            writer.add(canister)
+
+    with CanisterSnapshot(unsorted_path) as unsorted, CanisterSnapshot(sorted_path) as ordered:
+        assert [canister.to_document() for canister in unsorted] == [
+            canister.to_document() for canister in ordered
+        ]
+
+
+def test_a_canister_added_twice_keeps_its_last_record(tmp_path):
+    path = tmp_path / 'canisters.snapshot'
+    with CanisterSnapshotWriter(path) as writer:
+        for canister in canisters():
+            writer.add(canister)
+        writer.add(Canister(canister_id='aaaaa-aa', controllers=['r7inp-6aaaa-aaaaa-aaabq-cai']))
+
+    assert writer.count == 3
+    with CanisterSnapshot(path) as snapshot:
+        assert len(snapshot) == 3
+        assert snapshot.get('aaaaa-aa').controllers == ['r7inp-6aaaa-aaaaa-aaabq-cai']
+        assert snapshot.get('aaaaa-aa').subnet_id is None
+        assert snapshot.get('qoctq-giaaa-aaaaa-aaaea-cai').subnet_id == 'subnet-a'
+
+
+def test_an_empty_snapshot_can_be_written(tmp_path):
+    path = tmp_path / 'canisters.snapshot'
+    with CanisterSnapshotWriter(path):
+        pass
+
+    with CanisterSnapshot(path) as snapshot:
+        assert len(snapshot) == 0
+        assert snapshot.get('aaaaa-aa') is None
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'not-a-snapshot'
+    path.write_bytes(b'\0' * 128)
+
+    with pytest.raises(ValueError):
+        CanisterSnapshot(path)
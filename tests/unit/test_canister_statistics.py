@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from internet_computer.tools.stats import CanisterStatistics
+from internet_computer.tools.writers import CsvCanisterWriter
+from tests.conftest import FakeCollection
+
+
+def test_the_limit_follows_the_sort_and_single_field_reports_use_their_index():
+    collection = FakeCollection(rows=[{'subnet_id': 'subnet-a', 'canisters': 3}])
+    statistics = CanisterStatistics({'canisters': collection}, limit=10)
+
+    rows = list(statistics.run('subnets'))
+
+    pipeline, options = collection.calls[0]
+    sort_index = next(index for index, stage in enumerate(pipeline) if '$sort' in stage)
+    assert pipeline[sort_index + 1] == {'$limit': 10}
+    assert options['hint'] == [('subnet_id', 1)]
+    assert rows == [SimpleNamespace(subnet_id='subnet-a', canisters=3)]
+
+    list(statistics.run('module_hashes'))
+
+    _, options = collection.calls[1]
+    assert 'hint' not in options
+
+
+def test_every_report_has_a_pipeline_and_writes_its_fields():
+    for report in CanisterStatistics.reports:
+        assert CanisterStatistics({}, limit=0).pipeline(report)
+
+    writer = CsvCanisterWriter(fields_to_output=CanisterStatistics.report_fields['web_ratio'])
+    row = SimpleNamespace(subnet_id='subnet-a', canisters=4, checked=2, web_canisters=1, web_ratio=0.5)
+
+    assert writer.row(row) == 'subnet-a,4,2,1,0.5\n'
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from internet_computer.tools import commands
+from internet_computer.tools.checkpoint import FileCheckpointStore
+from internet_computer.tools.commands import CanisterWebStatusFetcher
+from tests.conftest import FakeCollection, FakeProbe
+
+
+class FakeConfigurator:
+    collection = None
+
+    def __init__(self, config_path, environment):
+        pass
+
+    def from_config(self):
+        return {'canisters': self.collection}
+
+
+def test_a_failing_writer_stops_web_status_instead_of_hanging(monkeypatch):
+    FakeConfigurator.collection = FakeCollection(
+        [{'_id': ObjectId(), 'canister_id': f'canister-{index}'} for index in range(100)],
+        failure=RuntimeError('bulk write failed')
+    )
+    monkeypatch.setattr(commands, 'MongoClientConfigurator', FakeConfigurator)
+
+    fetcher = CanisterWebStatusFetcher(
+        total_task_processors=4,
+        batch_size=1,
+        queue_size=2,
+        probe=FakeProbe()
+    )
+
+    with pytest.raises(RuntimeError, match='bulk write failed'):
+        asyncio.run(asyncio.wait_for(fetcher.populate('pymongo.yml', 'test'), timeout=10))
+
+
+def test_the_checkpoint_only_advances_past_contiguously_probed_canisters(monkeypatch, tmp_path):
+    documents = [{'_id': ObjectId(), 'canister_id': f'canister-{index}'} for index in range(6)]
+    FakeConfigurator.collection = FakeCollection(documents)
+    monkeypatch.setattr(commands, 'MongoClientConfigurator', FakeConfigurator)
+
+    location = str(tmp_path / 'checkpoints.json')
+    store = FileCheckpointStore(location)
+    last_contiguous = {'last_id': str(documents[1]['_id'])}
+    saved_while_blocked = []
+
+    class BlockingProbe(FakeProbe):
+        async def status(self, url):
+            # canister-2 stays in flight until the periodic checkpoint has
+            # caught up with everything before it, recording every save seen.
+            if 'canister-2.' in url:
+                while not saved_while_blocked or saved_while_blocked[-1] != last_contiguous:
+                    saved_while_blocked.append(store.load('web_status'))
+                    await asyncio.sleep(0.01)
+
+                # The later canisters finish meanwhile and must not move it.
+                await asyncio.sleep(0.1)
+                saved_while_blocked.append(store.load('web_status'))
+
+            return await super().status(url)
+
+    fetcher = CanisterWebStatusFetcher(
+        total_task_processors=4,
+        batch_size=1,
+        queue_size=2,
+        probe=BlockingProbe()
+    )
+
+    asyncio.run(asyncio.wait_for(
+        fetcher.populate('pymongo.yml', 'test', checkpoint_location=location, checkpoint_interval=0.01),
+        timeout=10
+    ))
+
+    assert saved_while_blocked[-2:] == [last_contiguous, last_contiguous]
+    assert all(
+        state is None or state['last_id'] <= last_contiguous['last_id'] for state in saved_while_blocked
+    )
+    assert store.load('web_status') == {'last_id': str(documents[-1]['_id'])}
@@ -0,0 +1,71 @@
+import base64
+import random
+import zlib
+from collections import Counter
+
+import pytest
+from bson import ObjectId
+
+from internet_computer.tools.commands import CanisterWebStatusFetcher
+from internet_computer.tools.inventory import Canister
+from tests.conftest import FakeCollection
+
+
+def principal(raw):
+    checksum = zlib.crc32(raw).to_bytes(4, 'big')
+    text = base64.b32encode(checksum + raw).decode().lower().rstrip('=')
+    return '-'.join(text[index:index + 5] for index in range(0, len(text), 5))
+
+
+def canister_ids(count):
+    generator = random.Random(7)
+    return [principal(generator.randbytes(10)) for _ in range(count)]
+
+
+def owner(canister_id, ranges):
+    return [
+        key for key, (lower, upper) in ranges.items()
+        if (lower is None or canister_id >= lower) and (upper is None or canister_id < upper)
+    ]
+
+
+def test_hosts_with_different_process_counts_split_the_canisters_exactly_once():
+    processes = [4, 1, 7]
+    ranges = {
+        (shard_index, process_index): CanisterWebStatusFetcher.shard_range(
+            shard_index, len(processes), process_index, shard_processes
+        )
+        for shard_index, shard_processes in enumerate(processes)
+        for process_index in range(shard_processes)
+    }
+
+    owners = [owner(canister_id, ranges) for canister_id in canister_ids(10000) + ['00001-aaaaa-cai', '~']]
+    assert all(len(keys) == 1 for keys in owners)
+
+    hosts = Counter(keys[0][0] for keys in owners)
+    assert min(hosts.values()) > 3000
+
+
+def test_shards_are_read_off_a_canister_id_range():
+    documents = [{'_id': ObjectId(), 'canister_id': canister_id} for canister_id in canister_ids(1000)]
+    collection = FakeCollection(documents)
+    Canister.set_client({Canister.collection_name: collection})
+
+    read = []
+    for process_index in range(3):
+        fetcher = CanisterWebStatusFetcher(shard_index=1, shard_count=2, process_index=process_index, processes=3)
+        read.extend(canister.canister_id for canister in fetcher.pending({'last_status_code': None}))
+
+    query_filter, _ = collection.queries[0]
+    assert query_filter['last_status_code'] is None
+    assert set(query_filter['canister_id']) == {'$gte', '$lt'}
+    assert sorted(read) == sorted(
+        document['canister_id'] for document in documents
+        if document['canister_id'] >= CanisterWebStatusFetcher.shard_range(1, 2)[0]
+    )
+    assert CanisterWebStatusFetcher().shard_filter == {}
+
+
+def test_more_processes_than_canister_ranges_are_rejected():
+    with pytest.raises(ValueError):
+        CanisterWebStatusFetcher(shard_count=512, processes=3)
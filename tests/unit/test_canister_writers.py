@@ -0,0 +1,160 @@
+import csv
+import gzip
+import io
+import json
+import sys
+
+import pytest
+
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.writers import (
+    CanisterWriter,
+    CsvCanisterWriter,
+    JsonCanisterWriter,
+    NdjsonCanisterWriter,
+)
+
+
+def build_canisters():
+    return [
+        Canister(
+            canister_id='2226x-viaaa-aaaaj-aab3q-cai',
+            controllers=['ujkeo-2rcd5', 'xkbqi-2qaaa'],
+            module_hash='1404b28b',
+            subnet_id='qdvhd-os4o2'
+        ),
+        Canister(
+            canister_id='rdmx6-jaaaa-aaaaa-aaadq-cai',
+            controllers=['r7inp-6aaaa, "quoted"'],
+            last_status_code=500,
+            is_web_canister=False
+        ),
+    ]
+
+
+def write(writer_class, **kwargs):
+    stream = io.StringIO()
+
+    with writer_class(stream=stream, buffer_size=16, **kwargs) as writer:
+        for canister in build_canisters():
+            writer.write(canister)
+
+    assert writer.count == 2
+
+    return stream.getvalue()
+
+
+def test_csv_rows_are_quoted():
+    rows = list(csv.reader(io.StringIO(write(CsvCanisterWriter))))
+
+    assert rows[0] == CsvCanisterWriter.default_fields
+    assert rows[1][1:3] == ['2226x-viaaa-aaaaj-aab3q-cai', 'ujkeo-2rcd5 xkbqi-2qaaa']
+    assert rows[2][2] == 'r7inp-6aaaa, "quoted"'
+    assert rows[2][4] == '500'
+
+
+def test_csv_rows_only_include_the_requested_fields():
+    rows = list(csv.reader(io.StringIO(
+        write(CsvCanisterWriter, fields_to_output=['canister_id', 'raw_canister_url'])
+    )))
+
+    assert rows == [
+        ['canister_id', 'raw_canister_url'],
+        ['2226x-viaaa-aaaaj-aab3q-cai', 'https://2226x-viaaa-aaaaj-aab3q-cai.raw.ic0.app/'],
+        ['rdmx6-jaaaa-aaaaa-aaadq-cai', 'https://rdmx6-jaaaa-aaaaa-aaadq-cai.raw.ic0.app/'],
+    ]
+
+
+def test_json_output_is_a_single_document():
+    document = json.loads(write(JsonCanisterWriter))
+
+    assert [canister['canister_id'] for canister in document['data']] == [
+        '2226x-viaaa-aaaaj-aab3q-cai',
+        'rdmx6-jaaaa-aaaaa-aaadq-cai',
+    ]
+    assert document['data'][0] == build_canisters()[0].to_dict()
+
+
+def test_json_output_without_an_envelope_has_one_document_per_line():
+    lines = write(JsonCanisterWriter, envelope=False, fields_to_output=['canister_id']).splitlines()
+
+    assert [json.loads(line) for line in lines] == [
+        {'canister_id': '2226x-viaaa-aaaaj-aab3q-cai'},
+        {'canister_id': 'rdmx6-jaaaa-aaaaa-aaadq-cai'},
+    ]
+
+
+def test_no_writer_is_built_without_an_output_format():
+    assert CanisterWriter.for_output('') is None
+    assert isinstance(CanisterWriter.for_output('csv'), CsvCanisterWriter)
+
+
+def test_ndjson_is_written_to_a_gzip_file(tmp_path):
+    output_file = tmp_path / 'canisters.ndjson.gz'
+
+    with CanisterWriter.for_output('ndjson', output_file=output_file) as writer:
+        assert isinstance(writer, NdjsonCanisterWriter)
+        for canister in build_canisters():
+            writer.write(canister)
+
+    with gzip.open(output_file, 'rt') as stream:
+        documents = [json.loads(line) for line in stream]
+
+    assert [document['canister_id'] for document in documents] == [
+        '2226x-viaaa-aaaaj-aab3q-cai',
+        'rdmx6-jaaaa-aaaaa-aaadq-cai',
+    ]
+
+
+def test_compression_is_inferred_from_the_file_extension():
+    assert CanisterWriter.compression_for('canisters.csv.gz') == 'gzip'
+    assert CanisterWriter.compression_for('canisters.ndjson.zst') == 'zstd'
+    assert CanisterWriter.compression_for('canisters.csv') == 'none'
+    assert CanisterWriter.compression_for('canisters.csv', 'gzip') == 'gzip'
+
+
+def test_parquet_snapshots_keep_controllers_as_lists(tmp_path):
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+
+    output_file = tmp_path / 'canisters.parquet'
+
+    with CanisterWriter.for_output('parquet', output_file=output_file, row_group_size=1) as writer:
+        for canister in build_canisters():
+            writer.write(canister)
+
+    parquet_file = pyarrow_parquet.ParquetFile(output_file)
+    table = parquet_file.read()
+
+    assert parquet_file.metadata.num_row_groups == 2
+    assert table.column('controllers').to_pylist() == [
+        ['ujkeo-2rcd5', 'xkbqi-2qaaa'],
+        ['r7inp-6aaaa, "quoted"'],
+    ]
+    assert table.column('last_status_code').to_pylist() == [None, 500]
+    assert table.column('_id').to_pylist() == [None, None]
+    assert 'RLE_DICTIONARY' in str(parquet_file.metadata.row_group(0).column(
+        table.schema.get_field_index('subnet_id')
+    ).encodings)
+
+
+def test_parquet_compression_defaults_to_zstd_and_none_writes_uncompressed(tmp_path):
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+
+    codecs = {}
+    for compression in [None, 'none', 'gzip']:
+        output_file = tmp_path / f'canisters-{compression}.parquet'
+
+        with CanisterWriter.for_output('parquet', output_file=output_file, compression=compression) as writer:
+            for canister in build_canisters():
+                writer.write(canister)
+
+        codecs[compression] = pyarrow_parquet.ParquetFile(output_file).metadata.row_group(0).column(0).compression
+
+    assert codecs == {None: 'ZSTD', 'none': 'UNCOMPRESSED', 'gzip': 'GZIP'}
+
+
+def test_compression_without_an_output_file_is_rejected():
+    with pytest.raises(ValueError, match='requires an output file'):
+        CanisterWriter.for_output('csv', compression='gzip')
+
+    assert CanisterWriter.for_output('csv', compression='none').stream is sys.stdout
@@ -0,0 +1,38 @@
+from internet_computer.tools.inventory import Canister
+from tests.conftest import FakeCollection
+
+
+def test_pages_are_keyed_on_the_last_canister_id(monkeypatch):
+    collection = FakeCollection([
+        {'canister_id': f'canister-{index}', 'controllers': ['alice' if index % 2 else 'bob']}
+        for index in range(7)
+    ])
+    monkeypatch.setattr(Canister, 'get_client', classmethod(lambda cls: {cls.collection_name: collection}))
+
+    pages = []
+    after = None
+    while True:
+        page = Canister.by_controller('alice', after=after, limit=2)
+        pages.append([canister.canister_id for canister in page])
+        if len(page) < 2:
+            break
+        after = page[-1].canister_id
+
+    assert pages == [['canister-1', 'canister-3'], ['canister-5']]
+    assert collection.queries[1][0]['canister_id'] == {'$gt': 'canister-3'}
+    # No forced index: deployments that predate controllers_index still run.
+    assert collection.queries[0][1] is None
+
+
+def test_many_controllers_resolve_in_one_query(monkeypatch):
+    collection = FakeCollection([
+        {'canister_id': 'a', 'controllers': ['alice']},
+        {'canister_id': 'b', 'controllers': ['bob', 'carol']},
+        {'canister_id': 'c', 'controllers': ['dave']},
+    ])
+    monkeypatch.setattr(Canister, 'get_client', classmethod(lambda cls: {cls.collection_name: collection}))
+
+    canisters = Canister.by_controllers(['alice', 'carol'])
+
+    assert [canister.canister_id for canister in canisters] == ['a', 'b']
+    assert len(collection.queries) == 1
@@ -0,0 +1,49 @@
+import threading
+
+from internet_computer.tools.checkpoint import CrawlCheckpoint, FileCheckpointStore
+
+
+def test_file_checkpoints_round_trip_per_name(tmp_path):
+    location = str(tmp_path / 'checkpoints.json')
+
+    fetch_checkpoint = CrawlCheckpoint.from_location(location, name='fetch_canisters')
+    web_status_checkpoint = CrawlCheckpoint.from_location(location, name='web_status')
+
+    assert fetch_checkpoint.load() is None
+
+    fetch_checkpoint.save({'offset': 300})
+    web_status_checkpoint.save({'last_id': '6350f0c1a4b1c2d3e4f50607'})
+    fetch_checkpoint.save({'offset': 400})
+
+    store = FileCheckpointStore(location)
+
+    assert store.load('fetch_canisters') == {'offset': 400}
+    assert store.load('web_status') == {'last_id': '6350f0c1a4b1c2d3e4f50607'}
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_a_checkpoint_is_due_once_its_interval_has_elapsed(tmp_path):
+    checkpoint = CrawlCheckpoint(FileCheckpointStore(tmp_path / 'checkpoints.json'), 'fetch', interval=0)
+
+    assert checkpoint.save_due()
+
+
+def test_concurrent_writers_keep_every_checkpoint(tmp_path):
+    location = tmp_path / 'checkpoints.json'
+    errors = []
+
+    def save_repeatedly(name):
+        try:
+            for offset in range(50):
+                FileCheckpointStore(location).save(name, {'offset': offset})
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=save_repeatedly, args=(f'web_status:{index}/4',)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert [FileCheckpointStore(location).load(f'web_status:{index}/4') for index in range(4)] == [{'offset': 49}] * 4
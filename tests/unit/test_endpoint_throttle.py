@@ -0,0 +1,106 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from internet_computer.tools.throttle import EndpointOverloadedError, EndpointThrottle
+
+
+def test_overload_halves_the_limit_once_and_successes_grow_it_back():
+    async def run():
+        throttle = EndpointThrottle('api', initial_concurrency=8, maximum_concurrency=16, attempts=1)
+        in_flight = []
+
+        async def overloaded():
+            in_flight.append(throttle.in_flight)
+            await asyncio.sleep(0.01)
+            return 503, None
+
+        # Eight concurrent overloads are one event and halve the limit once.
+        results = await asyncio.gather(
+            *(throttle.request(overloaded) for _ in range(8)),
+            return_exceptions=True
+        )
+        assert all(isinstance(result, EndpointOverloadedError) for result in results)
+        assert throttle.concurrency_limit == 4
+
+        async def succeed():
+            return 200, 'ok'
+
+        for _ in range(40):
+            assert await throttle.request(succeed) == 'ok'
+
+        return throttle.concurrency_limit
+
+    assert asyncio.run(run()) > 4
+
+
+def test_in_flight_requests_never_exceed_the_limit():
+    async def run():
+        throttle = EndpointThrottle('api', initial_concurrency=3, maximum_concurrency=3)
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            peak = max(peak, throttle.in_flight)
+            await asyncio.sleep(0.005)
+            return 200, None
+
+        await asyncio.gather(*(throttle.request(request) for _ in range(30)))
+
+        return peak
+
+    assert asyncio.run(run()) == 3
+
+
+def test_timeouts_are_retried_then_raised():
+    async def run():
+        throttle = EndpointThrottle('api', attempts=3, base_delay=0.001)
+        calls = 0
+
+        async def timeout():
+            nonlocal calls
+            calls += 1
+            raise asyncio.TimeoutError()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await throttle.request(timeout)
+
+        return calls
+
+    assert asyncio.run(run()) == 3
+
+
+def test_slow_start_doubles_the_limit_until_the_first_overload():
+    async def run():
+        throttle = EndpointThrottle('api', initial_concurrency=2, maximum_concurrency=64)
+
+        async def succeed():
+            return 200, None
+
+        await asyncio.gather(*(throttle.request(succeed) for _ in range(2)))
+        doubled = throttle.concurrency_limit
+
+        await asyncio.gather(*(throttle.request(succeed) for _ in range(100)))
+
+        return doubled, throttle.concurrency_limit
+
+    assert asyncio.run(run()) == (4, 64)
+
+
+def test_target_failures_are_raised_without_shrinking_the_limit():
+    async def run():
+        throttle = EndpointThrottle('web_probe', initial_concurrency=16, failures_are_overload=False)
+        calls = 0
+
+        async def refused():
+            nonlocal calls
+            calls += 1
+            raise aiohttp.ClientConnectionError()
+
+        with pytest.raises(aiohttp.ClientConnectionError):
+            await throttle.request(refused)
+
+        return calls, throttle.concurrency_limit
+
+    assert asyncio.run(run()) == (1, 16)
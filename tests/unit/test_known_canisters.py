@@ -0,0 +1,18 @@
+from internet_computer.tools.inventory import Canister
+from internet_computer.tools.membership import KnownCanisters
+
+
+def test_membership_and_fingerprints_follow_the_stored_content():
+    known = KnownCanisters.from_documents([
+        {'canister_id': f'canister-{index}', 'controllers': ['b', 'a'], 'module_hash': 'v1', 'subnet_id': 's'}
+        for index in range(1000)
+    ])
+
+    assert len(known) == 1000
+    assert 'canister-999' in known
+    assert 'canister-1000' not in known
+
+    assert known.unchanged(Canister(canister_id='canister-5', controllers=['a', 'b'], module_hash='v1', subnet_id='s'))
+    assert not known.unchanged(Canister(canister_id='canister-5', controllers=['a'], module_hash='v1', subnet_id='s'))
+    assert not known.unchanged(Canister(canister_id='canister-5', controllers=['a', 'b'], module_hash='v2', subnet_id='s'))
+    assert not known.unchanged(Canister(canister_id='canister-1000', controllers=['a', 'b'], module_hash='v1'))
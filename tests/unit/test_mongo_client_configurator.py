@@ -2,7 +2,7 @@ import os
 from pathlib import Path
 import yaml
 
-from ic0_fraud_detection.pymongo_fixes import MongoClientConfigurator
+from internet_computer.tools.pymongo_fixes import MongoClientConfigurator
 
 
 def test_it_returns_an_error_when_there_is_no_config_file():
@@ -22,3 +22,63 @@ def test_it_returns_a_mongo_client_with_proper_environment():
     ).from_config()
 
     assert 'my_db' == mongo_client.name
+
+
+def test_it_maps_client_options_onto_mongo_client_keyword_arguments():
+    client_options = MongoClientConfigurator.client_options({
+        'write': {'w': 0},
+        'read': {'mode': ':secondary_preferred', 'tag_sets': [{'use': 'web'}]},
+        'max_pool_size': 200,
+        'wait_queue_timeout': 1,
+        'socket_timeout': 2.5,
+        'compressors': ['zstd', 'snappy'],
+        'retry_writes': False,
+        'auth_mech': ':scram256',
+        'roles': ['dbOwner'],
+    })
+
+    assert client_options == {
+        'w': 0,
+        'readPreference': 'secondaryPreferred',
+        'readPreferenceTags': ['use:web'],
+        'maxPoolSize': 200,
+        'waitQueueTimeoutMS': 1000,
+        'socketTimeoutMS': 2500,
+        'compressors': 'zstd,snappy',
+        'retryWrites': False,
+        'authMechanism': 'SCRAM-SHA-256',
+    }
+
+
+def test_it_reuses_one_client_per_config_and_environment():
+    config_path = os.path.join(os.path.dirname(Path(__file__).resolve()), 'pymongo.yml')
+
+    first = MongoClientConfigurator(config_path=config_path, environment='development').from_config()
+    second = MongoClientConfigurator(config_path=config_path, environment='development').from_config()
+
+    assert first.client is second.client
+    assert first.client.write_concern.document == {'w': 1}
+    assert first.client.options.pool_options.max_pool_size == 5
+
+
+def test_it_accepts_a_uri(tmp_path):
+    config_path = tmp_path / 'pymongo.yml'
+    config_path.write_text(yaml.safe_dump({
+        'uri_environment': {
+            'clients': {
+                'default': {
+                    'uri': 'mongodb://mongo:27017/canisters_from_uri?retryWrites=false',
+                    'options': {'max_pool_size': 50}
+                }
+            }
+        }
+    }))
+
+    database = MongoClientConfigurator(
+        config_path=str(config_path),
+        environment='uri_environment'
+    ).from_config()
+
+    assert database.name == 'canisters_from_uri'
+    assert database.client.options.pool_options.max_pool_size == 50
+    assert database.client.options.retry_writes is False
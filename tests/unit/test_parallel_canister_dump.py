@@ -0,0 +1,48 @@
+import gzip
+
+import pytest
+
+from internet_computer.tools.parallel_dump import ParallelCanisterDump
+
+
+def build_dump(output_file, output='csv'):
+    return ParallelCanisterDump(
+        pymongo_config_path='pymongo.yml',
+        environment='test',
+        output=output,
+        output_file=output_file,
+        workers=2
+    )
+
+
+def test_shard_files_keep_the_output_file_extensions(tmp_path):
+    dump = build_dump(tmp_path / 'canisters.csv.gz')
+
+    assert dump.shard_file(3) == tmp_path / 'canisters.part-00003.csv.gz'
+    assert dump.manifest_file == tmp_path / 'canisters.csv.gz.manifest.json'
+
+
+def test_csv_shards_are_merged_under_a_single_header(tmp_path):
+    dump = build_dump(tmp_path / 'canisters.csv.gz')
+
+    shards = []
+    for index, rows in enumerate([['a', 'b'], ['c']]):
+        shard_file = dump.shard_file(index)
+        with gzip.open(shard_file, 'wt') as stream:
+            stream.write('canister_id\n' + ''.join(f'{row}\n' for row in rows))
+        shards.append({'file': shard_file.name})
+
+    dump.merge(shards)
+
+    with gzip.open(tmp_path / 'canisters.csv.gz', 'rt') as stream:
+        assert stream.read() == 'canister_id\na\nb\nc\n'
+
+    assert not dump.shard_file(0).exists()
+
+
+def test_unmergeable_outputs_are_rejected_before_dumping(tmp_path, monkeypatch):
+    dump = build_dump(tmp_path / 'canisters.json', output='json')
+    monkeypatch.setattr(ParallelCanisterDump, 'tasks', lambda self: pytest.fail('dumped before validating'))
+
+    with pytest.raises(ValueError, match='cannot be merged'):
+        dump.dump(merge=True)
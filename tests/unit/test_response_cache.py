@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from internet_computer.tools.cache import CacheMissError, ResponseCache
+
+
+def test_stale_entries_are_revalidated_with_their_etag(tmp_path, http_server):
+    requests_seen = []
+
+    async def handler(request):
+        requests_seen.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304)
+        return web.Response(text=json.dumps({'data': []}), headers={'ETag': '"v1"'})
+
+    url = http_server.serve(handler) + '/'
+    cache = ResponseCache(tmp_path, ttl=0)
+
+    async def fetch_twice():
+        async with aiohttp.ClientSession() as session:
+            return await cache.get_async(session, url), await cache.get_async(session, url)
+
+    first, second = asyncio.run(fetch_twice())
+
+    assert first == second == (200, '{"data": []}')
+    assert requests_seen == [None, '"v1"']
+
+
+def test_fresh_and_offline_entries_are_served_without_a_request(tmp_path):
+    cache = ResponseCache(tmp_path, ttl=60)
+    cache.update('http://api/page', None, 200, {}, 'cached body')
+
+    assert cache.cached('http://api/page') == 'cached body'
+
+    offline = ResponseCache(tmp_path, ttl=0, offline=True)
+    assert offline.get('http://api/page') == (200, 'cached body')
+
+    with pytest.raises(CacheMissError):
+        offline.get('http://api/missing')
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size_bound(tmp_path):
+    cache = ResponseCache(tmp_path, max_size=3000)
+
+    for index in range(3):
+        cache.update(f'http://api/{index}', None, 200, {}, 'x' * 1000)
+
+    assert cache.lookup('http://api/0') is None
+    assert cache.lookup('http://api/2') is not None
+    assert cache.size() <= 3000